@@ -1,21 +1,61 @@
+# Imported first so cold-start timings cover the rest of this module
+import startup
 import os
-import re
+import base64
+import hashlib
+import zlib
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.document_loaders import WebBaseLoader
-from langchain.prompts import PromptTemplate
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import asyncio
+import json
+import time
+import threading
 import uvicorn
-from collections import Counter
-from typing import List, Dict
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional
+
+import codec
+import fetcher
+import keywords
+import workers
+from keywords import extract_keywords_optimized
+from prompts import PromptTemplate
+from compact import compact_cached
+import metrics
+import resilience
+from llm import LLMScheduler
+from metrics import stage
+from page_cache import PageCache
+from llm_cache import LLMCache, make_key
+from singleflight import SingleFlight
+from store import get_store, counters as store_counters
+from text_chunks import estimate_tokens, split_into_chunks, split_content_defined
+from retrieval import BM25Index, IndexCache
+from sessions import SessionStore
+from prefetch import Prefetcher, PREFETCH_LLM_SHARE
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lag_monitor = asyncio.create_task(metrics.monitor_event_loop())
+    prefetcher.start()
+    yield
+    prefetcher.stop()
+    lag_monitor.cancel()
+    # Release pooled connections and workers, and persist corpus statistics on shutdown
+    await fetcher.close_client()
+    workers.shutdown()
+    if similarity_engine is not None:
+        similarity_engine.save()
+
 # Initialize FastAPI app
-app = FastAPI()
+# orjson-rendered JSON; hot endpoints return FastJSONResponse directly to skip jsonable_encoder
+app = FastAPI(lifespan=lifespan, default_response_class=codec.FastJSONResponse)
 
 # Add CORS middleware for local development
 from fastapi.middleware.cors import CORSMiddleware
@@ -26,112 +66,507 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Prompt-Tokens-Saved", "Retry-After"],
 )
 
-class SummarizeRequest(BaseModel):
-    url: str
+# br/gzip response compression and decoding of compressed request bodies
+app.add_middleware(codec.CompressionMiddleware)
+
+# Per-stage latency histograms and the Server-Timing response header
+app.add_middleware(metrics.MetricsMiddleware)
+
+# End-to-end deadline inherited by the fetch and LLM calls made for a request
+app.add_middleware(resilience.DeadlineMiddleware)
+
+class PageRequest(BaseModel):
+    # Either a URL to fetch, or page text extracted by the extension
+    url: Optional[str] = None
+    content: Optional[str] = None
+    # "gzip" when content is base64-encoded gzip data
+    content_encoding: Optional[str] = None
+    # SHA-256 of the page text; lets the client skip resending known content
+    content_hash: Optional[str] = None
+    # Returned by /summarize; follow-up calls reuse that page's server-side state
+    session_id: Optional[str] = None
 
-class QARequest(BaseModel):
-    url: str
+class SummarizeRequest(PageRequest):
+    pass
+
+class QARequest(PageRequest):
     question: str
 
-# Initialize the model
-api_key = os.getenv("GOOGLE_API_KEY")
-model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=api_key)
+class BatchQARequest(PageRequest):
+    questions: List[str]
+
+class BatchSummarizeRequest(BaseModel):
+    urls: List[str]
+
+class PrefetchRequest(BaseModel):
+    urls: List[str]
+    # Higher values are prefetched sooner
+    priority: int = 0
+
+# Initialize the model behind the quota-aware scheduler (LLM_PROVIDER selects the backend);
+# the model client itself is created on the first call
+llm_scheduler = LLMScheduler()
 
 # Simple feature extraction functions
 def extract_keywords(text):
     """Extract keywords from text"""
-    # Remove punctuation and convert to lowercase
-    text = re.sub(r'[^\w\s]', '', text.lower())
-    # Split into words
-    words = text.split()
-    # Filter out common stop words and short words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those'}
-    keywords = [word for word in words if len(word) > 3 and word not in stop_words]
-    return keywords
-
-def calculate_similarity(question_keywords, answer_keywords):
-    """Calculate similarity between question and answer keywords"""
-    if not question_keywords or not answer_keywords:
-        return 0.0
-    
-    # Convert to sets for intersection
-    question_set = set(question_keywords)
-    answer_set = set(answer_keywords)
-    
-    # Calculate Jaccard similarity
-    intersection = question_set.intersection(answer_set)
-    union = question_set.union(answer_set)
-    
-    if len(union) == 0:
-        return 0.0
-    
-    similarity = len(intersection) / len(union)
-    return similarity
-
-def extract_features(content, question, answer):
-    """Extract features for visualization"""
-    # Extract keywords from content, question, and answer
-    content_keywords = extract_keywords(content)
-    question_keywords = extract_keywords(question)
-    answer_keywords = extract_keywords(answer)
-    
-    # Calculate similarity scores
-    content_question_similarity = calculate_similarity(content_keywords, question_keywords)
-    content_answer_similarity = calculate_similarity(content_keywords, answer_keywords)
-    question_answer_similarity = calculate_similarity(question_keywords, answer_keywords)
-    
-    # Count keyword frequencies
-    content_keyword_freq = Counter(content_keywords)
-    question_keyword_freq = Counter(question_keywords)
-    answer_keyword_freq = Counter(answer_keywords)
-    
-    # Get top keywords
-    top_content_keywords = [kw for kw, _ in content_keyword_freq.most_common(5)]
-    top_question_keywords = [kw for kw, _ in question_keyword_freq.most_common(5)]
-    top_answer_keywords = [kw for kw, _ in answer_keyword_freq.most_common(5)]
+    # Punctuation removal, lowercasing and stop-word filtering in one pass
+    return keywords.tokenize(text)
+
+# Corpus-weighted similarity; IDF statistics grow as pages are processed
+# Created on first use so numpy stays out of the cold start
+similarity_engine = None
+similarity_engine_lock = threading.Lock()
+
+def get_similarity_engine():
+    global similarity_engine
+    if similarity_engine is None:
+        # Feature extraction for large pages runs on worker threads
+        with similarity_engine_lock:
+            if similarity_engine is None:
+                with startup.record("similarity_engine"):
+                    from similarity import SimilarityEngine
+                    similarity_engine = SimilarityEngine()
+    return similarity_engine
+
+def content_vector(content_stats):
+    """Similarity vector of page content, cached with its keyword stats"""
+    engine = get_similarity_engine()
+    if content_stats.vector is None:
+        content_stats.vector = engine.vectorize(content_stats.counts)
+        if content_stats.key is not None:
+            engine.observe(content_stats.key, content_stats.vector)
+    return content_stats.vector
+
+def extract_features_batch(content, questions, answers, content_stats=None):
+    """Extract features for several question/answer pairs about one page"""
+    # Keyword frequencies; the content side is memoized per content hash
+    if content_stats is None:
+        content_stats = keywords.content_stats(content)
+    question_stats = [keywords.KeywordStats(question) for question in questions]
+    answer_stats = [keywords.KeywordStats(answer) for answer in answers]
     
-    return {
-        "content_question_similarity": round(content_question_similarity, 3),
-        "content_answer_similarity": round(content_answer_similarity, 3),
-        "question_answer_similarity": round(question_answer_similarity, 3),
-        "top_content_keywords": top_content_keywords,
-        "top_question_keywords": top_question_keywords,
-        "top_answer_keywords": top_answer_keywords,
-        "content_length": len(content),
-        "answer_length": len(answer)
-    }
+    # Cosine similarities of every pair in one matrix operation:
+    # row 0 is the content, then the questions, then the answers
+    vectors = [content_vector(content_stats)]
+    engine = get_similarity_engine()
+    vectors += [engine.vectorize(stats.counts) for stats in question_stats + answer_stats]
+    matrix = engine.similarity_matrix(vectors)
+    score = engine.score
+    
+    n = len(questions)
+    features = []
+    for i in range(n):
+        q, a = 1 + i, 1 + n + i
+        features.append({
+            "content_question_similarity": round(score(matrix, 0, q), 3),
+            "content_answer_similarity": round(score(matrix, 0, a), 3),
+            "question_answer_similarity": round(score(matrix, q, a), 3),
+            "top_content_keywords": content_stats.top(5),
+            "top_question_keywords": question_stats[i].top(5),
+            "top_answer_keywords": answer_stats[i].top(5),
+            "content_length": len(content),
+            "answer_length": len(answers[i])
+        })
+    return features
+
+def extract_features(content, question, answer, content_stats=None):
+    """Extract features for visualization"""
+    return extract_features_batch(content, [question], [answer], content_stats)[0]
+
+async def page_keyword_stats(content, session=None):
+    """Memoized keyword stats of page content; large pages are counted off the event loop"""
+    if session is not None and session.keyword_stats is not None:
+        return session.keyword_stats
+    key = keywords.content_key(content)
+    content_stats = keywords.cached_stats(key)
+    if content_stats is None:
+        # Store reads and writes (SQLite, zlib, JSON of the counts) run on a thread
+        if keywords.persisted(len(content)):
+            content_stats = await asyncio.to_thread(keywords.load_stats, key, len(content))
+        if content_stats is None:
+            counts = await workers.run(keywords.count_keywords, content, size=len(content), process_safe=True)
+            content_stats = keywords.KeywordStats(content, key, counts)
+            if keywords.persisted(len(content)):
+                await asyncio.to_thread(keywords.save_stats, key, content_stats, len(content))
+        keywords.remember(key, content_stats)
+    if session is not None:
+        session.keyword_stats = content_stats
+    return content_stats
+
+async def compute_features(content, questions, answers, session=None):
+    """Features for question/answer pairs, computed off the event loop for large pages"""
+    content_stats = await page_keyword_stats(content, session)
+    # Vectorizing the page is the expensive part, and it is cached on its stats
+    size = len(content) if content_stats.vector is None else 0
+    return await workers.run(extract_features_batch, content, questions, answers, content_stats, size=size)
 
 # Define prompt templates
 summary_template = PromptTemplate.from_template(
     "Summarize the following web page content in under 200 words:\n\n{content}"
 )
 
+chunk_summary_template = PromptTemplate.from_template(
+    "Summarize the following section of a web page in under 150 words:\n\n{content}"
+)
+
+combine_summary_template = PromptTemplate.from_template(
+    "The following are summaries of consecutive sections of one web page. "
+    "Combine them into a single summary of the page in under 200 words:\n\n{content}"
+)
+
 qa_template = PromptTemplate.from_template(
     "Use the following content to answer the question.\n\nContent:\n{content}\n\nQuestion: {question}\n\nAnswer:"
 )
 
-def load_web_page(url: str) -> str:
+# Model results, keyed by a hash of content, template, model and question
+llm_cache = LLMCache()
+
+# Concurrent identical fetches and model calls share one in-flight task
+fetch_flight = SingleFlight()
+llm_flight = SingleFlight()
+
+def format_prompt(template: PromptTemplate, content: str, question: str = None, **variables) -> str:
+    with stage("prompt"):
+        if question is not None:
+            variables["question"] = question
+        prompt = template.format(content=content, **variables)
+    metrics.PROMPT_TOKENS.observe(estimate_tokens(prompt))
+    return prompt
+
+# Page text is compacted (whitespace, repeated lines) and trimmed to these budgets
+# before it goes into prompts; 0 disables trimming
+COMPACT_SUMMARY_TOKENS = int(os.getenv("COMPACT_SUMMARY_TOKENS", "24000"))
+COMPACT_QA_TOKENS = int(os.getenv("COMPACT_QA_TOKENS", "32000"))
+
+async def compact_for_prompt(content: str, max_tokens: int) -> str:
+    """Compacted page text for prompts; the tokens saved are reported per request"""
+    with stage("compact"):
+        result = await workers.run(compact_cached, content, max_tokens, size=len(content))
+    metrics.record_tokens_saved(result.saved_tokens)
+    return result.text
+
+async def call_model(prompt: str) -> str:
+    """One model call, timed as the llm stage with failures counted"""
+    try:
+        with stage("llm"):
+            return await llm_scheduler.generate(prompt)
+    except Exception as e:
+        metrics.record_error("llm", e)
+        raise
+
+async def _invoke_model(key: str, prompt: str) -> str:
+    text = await call_model(prompt)
+    await llm_cache.aset(key, text)
+    return text
+
+async def run_prompt(template: PromptTemplate, content: str, question: str = None) -> str:
+    """Format a prompt and invoke the model, reusing cached results"""
+    key = make_key(template.template, llm_scheduler.model_name, content, question)
+    cached = await llm_cache.aget(key)
+    if cached is not None:
+        return cached
+    
+    prompt = format_prompt(template, content, question)
+    return await resilience.within(llm_flight.do(key, _invoke_model, key, prompt), "the language model")
+
+async def stream_prompt(template: PromptTemplate, content: str, question: str = None):
+    """Yield model output as it is generated, caching the complete text"""
+    key = make_key(template.template, llm_scheduler.model_name, content, question)
+    cached = await llm_cache.aget(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    prompt = format_prompt(template, content, question)
+    parts = []
+    try:
+        with stage("llm"):
+            async for piece in llm_scheduler.stream(prompt):
+                parts.append(piece)
+                yield piece
+    except Exception as e:
+        metrics.record_error("llm", e)
+        raise
+    await llm_cache.aset(key, "".join(parts))
+
+# Pages above this size are summarized in chunks (map) and then combined (reduce)
+SUMMARY_SINGLE_PASS_TOKENS = int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", "8000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "4000"))
+SUMMARY_MAX_PARALLEL = int(os.getenv("SUMMARY_MAX_PARALLEL", "4"))
+
+summary_chunks = {"reused": 0, "summarized": 0}
+
+async def prepare_summary(content: str):
+    """Return the template and text for the final summary prompt
+    
+    Large pages are first reduced to chunk summaries (the map step). When such a
+    page changes between visits, only its new or edited chunks go to the model.
+    Smaller pages always take one call, which no chunking can beat.
+    """
+    if estimate_tokens(content) <= SUMMARY_SINGLE_PASS_TOKENS:
+        return summary_template, content
+    
+    limit = asyncio.Semaphore(SUMMARY_MAX_PARALLEL)
+    
+    async def summarize_chunk(chunk):
+        # Unchanged chunks of a revisited page keep their partial summaries
+        key = make_key(chunk_summary_template.template, llm_scheduler.model_name, chunk)
+        cached = await llm_cache.aget(key)
+        if cached is not None:
+            summary_chunks["reused"] += 1
+            return cached
+        summary_chunks["summarized"] += 1
+        async with limit:
+            return await resilience.within(
+                llm_flight.do(key, _invoke_model, key, format_prompt(chunk_summary_template, chunk)), "the language model")
+    
+    # Content-defined boundaries keep unchanged chunks identical between versions
+    chunks = split_content_defined(content, SUMMARY_CHUNK_TOKENS)
+    partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+    combined = "\n\n".join(partials)
+    
+    # Very long pages may need another map round before the final reduce
+    if estimate_tokens(combined) > SUMMARY_SINGLE_PASS_TOKENS:
+        return await prepare_summary(combined)
+    return combine_summary_template, combined
+
+async def summarize_content(content: str) -> str:
+    """Summarize page text, using map-reduce for large pages"""
+    template, text = await prepare_summary(await compact_for_prompt(content, COMPACT_SUMMARY_TOKENS))
+    return await run_prompt(template, text)
+
+# QA prompts only carry the chunks most relevant to the question
+QA_CONTEXT_TOKENS = int(os.getenv("QA_CONTEXT_TOKENS", "3000"))
+QA_CHUNK_TOKENS = int(os.getenv("QA_CHUNK_TOKENS", "300"))
+QA_TOP_K = int(os.getenv("QA_TOP_K", "8"))
+
+qa_indexes = IndexCache()
+
+def build_qa_index(content: str) -> BM25Index:
+    return BM25Index(split_into_chunks(content, QA_CHUNK_TOKENS), extract_keywords)
+
+def select_qa_context(content: str, question: str, session=None) -> str:
+    """Return the page text, or its top-ranked chunks for long pages"""
+    if estimate_tokens(content) <= QA_CONTEXT_TOKENS:
+        return content
+    
+    if session is not None and session.qa_index is not None:
+        index = session.qa_index
+    else:
+        index = qa_indexes.get_or_build(content, build_qa_index)
+        if session is not None:
+            session.qa_index = index
+    selected = []
+    used = 0
+    for i, score in index.search(question, QA_TOP_K):
+        if score <= 0:
+            break
+        tokens = estimate_tokens(index.chunks[i])
+        if used + tokens > QA_CONTEXT_TOKENS:
+            continue
+        selected.append(i)
+        used += tokens
+    
+    # Nothing matched lexically: fall back to the start of the page
+    if not selected:
+        selected = [0]
+    # Keep the original reading order
+    return "\n\n".join(index.chunks[i] for i in sorted(selected))
+
+# Several questions about one short page can share a single prompt
+QA_BATCH_MAX_QUESTIONS = int(os.getenv("QA_BATCH_MAX_QUESTIONS", "20"))
+
+batch_qa_template = PromptTemplate.from_template(
+    "Use the following content to answer each of the numbered questions.\n\n"
+    "Content:\n{content}\n\nQuestions:\n{questions}\n\n"
+    "Respond with only a JSON array of answer strings, one per question, in the same order."
+)
+
+def parse_batch_answers(text: str, expected: int):
+    """Parse the JSON array returned for a batched prompt, or None if unusable"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("["):]
+    try:
+        answers = json.loads(text[:text.rfind("]") + 1])
+    except ValueError:
+        return None
+    if not isinstance(answers, list) or len(answers) != expected:
+        return None
+    return [str(answer) for answer in answers]
+
+async def answer_batch(content: str, questions: List[str], session=None) -> List[str]:
+    """Answer several questions about one page"""
+    contexts = [await workers.run(select_qa_context, content, question, session, size=len(content)) for question in questions]
+    keys = [make_key(qa_template.template, llm_scheduler.model_name, context, question) for context, question in zip(contexts, questions)]
+    cached = list(await asyncio.gather(*(llm_cache.aget(key) for key in keys)))
+    pending = [i for i, answer in enumerate(cached) if answer is None]
+    
+    # The whole page fits in one prompt: ask every pending question at once
+    if len(pending) > 1 and all(contexts[i] is content for i in pending):
+        numbered = "\n".join(f"{n}. {questions[i]}" for n, i in enumerate(pending, 1))
+        reply = await call_model(format_prompt(batch_qa_template, content, questions=numbered))
+        answers = parse_batch_answers(reply, len(pending))
+        if answers is not None:
+            for i, answer in zip(pending, answers):
+                cached[i] = answer
+                await llm_cache.aset(keys[i], answer)
+            pending = []
+    
+    # Otherwise (long pages or an unparseable batch reply) answer concurrently
+    answers = await asyncio.gather(*(run_prompt(qa_template, contexts[i], questions[i]) for i in pending))
+    for i, answer in zip(pending, answers):
+        cached[i] = answer
+    return cached
+
+# Page text sent by clients, keyed by its SHA-256
+MAX_CLIENT_CONTENT_BYTES = int(os.getenv("MAX_CLIENT_CONTENT_BYTES", str(5 * 1024 * 1024)))
+
+content_cache = PageCache()
+
+def content_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def decode_client_content(content: str, encoding: Optional[str]) -> str:
+    """Decode page text sent by the client, enforcing the size limit"""
+    if encoding in (None, "", "identity"):
+        if len(content) > MAX_CLIENT_CONTENT_BYTES:
+            raise HTTPException(status_code=413, detail="Page content is too large")
+        return content
+    if encoding != "gzip":
+        raise HTTPException(status_code=400, detail=f"Unsupported content_encoding: {encoding}")
+    
+    try:
+        compressed = base64.b64decode(content, validate=True)
+        # Cap the output so a small body cannot inflate without bound
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = decompressor.decompress(compressed, MAX_CLIENT_CONTENT_BYTES + 1)
+    except (ValueError, zlib.error):
+        raise HTTPException(status_code=400, detail="content is not valid base64-encoded gzip data")
+    if len(data) > MAX_CLIENT_CONTENT_BYTES or decompressor.unconsumed_tail:
+        raise HTTPException(status_code=413, detail="Page content is too large")
+    return data.decode("utf-8", errors="replace")
+
+# Page state kept between /summarize and follow-up questions
+sessions = SessionStore()
+
+async def resolve_page(req: PageRequest):
+    """Page text and the request's session, if it names a live one"""
+    if req.session_id:
+        session = sessions.get(req.session_id)
+        if session is not None:
+            return session.text, session
+        if not (req.url or req.content or req.content_hash):
+            raise HTTPException(status_code=404, detail="Unknown or expired session_id; resend the request with url or content")
+    return await get_page_content(req), None
+
+async def get_page_content(req: PageRequest) -> str:
+    """Resolve the page text for a request, fetching the URL only as a fallback"""
+    if req.content:
+        text = await asyncio.to_thread(decode_client_content, req.content, req.content_encoding)
+        digest = content_digest(text)
+        if req.content_hash and req.content_hash.lower() != digest:
+            raise HTTPException(status_code=400, detail="content_hash does not match content")
+        content_cache.store(digest, text)
+        return text
+    
+    if req.content_hash:
+        entry = content_cache.lookup(req.content_hash.lower())
+        if entry is not None:
+            return entry.text
+    
+    if not req.url:
+        if req.content_hash:
+            raise HTTPException(status_code=404, detail="Unknown content_hash; resend the request with content")
+        raise HTTPException(status_code=400, detail="Either url or content is required")
+    return await load_web_page(req.url)
+
+# Extracted page text, keyed by URL
+page_cache = PageCache()
+
+async def load_web_page(url: str) -> str:
     """Load and extract text from a web page"""
-    loader = WebBaseLoader(url)
-    documents = loader.load()
-    return "\n".join([doc.page_content for doc in documents])
+    entry = page_cache.lookup(url)
+    if entry is None:
+        # Another worker (or an earlier run) may already have this page
+        entry = await asyncio.to_thread(load_stored_page, url)
+    if entry is not None and page_cache.is_fresh(entry):
+        return entry.text
+    return await resilience.within(fetch_flight.do(url, _refresh_page, url, entry), "the page")
+
+def load_stored_page(url: str):
+    """Copy a page from the persistent store into the page cache"""
+    stored = get_store().get("page", url)
+    if stored is None:
+        return None
+    page = json.loads(stored)
+    page_cache.store(url, page["text"], page["etag"], page["last_modified"], page["fetched_at"])
+    return page_cache.peek(url)
+
+def save_stored_page(url: str, entry):
+    get_store().set("page", url, json.dumps({
+        "text": entry.text,
+        "etag": entry.etag,
+        "last_modified": entry.last_modified,
+        "fetched_at": entry.fetched_at,
+    }))
+
+async def _refresh_page(url: str, entry) -> str:
+    """Fetch a page that is missing from (or stale in) the page cache"""
+    # Revalidate stale entries with a conditional GET
+    headers = page_cache.validators(entry) if entry is not None else None
+    try:
+        # Text is extracted incrementally while the body downloads
+        start = time.perf_counter()
+        page = await fetcher.fetch_page(url, headers=headers)
+    except Exception as e:
+        metrics.record_error("fetch", e)
+        raise
+    metrics.observe_stage("parse", page.parse_seconds)
+    metrics.observe_stage("fetch", time.perf_counter() - start - page.parse_seconds)
+    
+    if entry is not None and page.status_code == 304:
+        page_cache.mark_revalidated(url)
+        await asyncio.to_thread(save_stored_page, url, entry)
+        return entry.text
+    
+    metrics.PAGE_CHARS.observe(len(page.text))
+    if page.text:
+        page_cache.store(url, page.text, page.etag, page.last_modified)
+        await asyncio.to_thread(save_stored_page, url, page_cache.peek(url))
+    return page.text
 
 @app.post("/summarize")
 async def summarize(req: SummarizeRequest):
     try:
         # Load web page content
-        page_content = load_web_page(req.url)
+        page_content, session = await resolve_page(req)
         
         if not page_content:
             raise HTTPException(status_code=400, detail="Failed to extract content from the provided URL")
         
+        if session is None:
+            session = sessions.create(page_content, req.url)
+        elif session.summary is not None:
+            return codec.FastJSONResponse({"summary": session.summary, "session_id": session.id})
+        
         # Generate summary using prompt template
-        prompt = summary_template.format(content=page_content)
-        response = model.invoke(prompt)
+        summary = None
+        if req.url and req.content:
+            summary = await prefetched_summary(req.url, page_content)
+        if summary is None:
+            summary = await summarize_content(page_content)
+        session.summary = summary
+        sessions.update(session)
         
-        return {"summary": response.content}
+        return codec.FastJSONResponse({"summary": summary, "session_id": session.id})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
 
@@ -139,25 +574,315 @@ async def summarize(req: SummarizeRequest):
 async def qa(req: QARequest):
     try:
         # Load web page content
-        page_content = load_web_page(req.url)
+        page_content, session = await resolve_page(req)
         
         if not page_content:
             raise HTTPException(status_code=400, detail="Failed to extract content from the provided URL")
         
         # Generate answer using prompt template
-        prompt = qa_template.format(content=page_content, question=req.question)
-        response = model.invoke(prompt)
+        prompt_content = await compact_for_prompt(page_content, COMPACT_QA_TOKENS)
+        with stage("retrieval"):
+            context = await workers.run(select_qa_context, prompt_content, req.question, session, size=len(prompt_content))
+        answer = await run_prompt(qa_template, context, req.question)
         
         # Extract features for visualization
-        features = extract_features(page_content, req.question, response.content)
+        with stage("features"):
+            features = (await compute_features(page_content, [req.question], [answer], session))[0]
+        if session is not None:
+            sessions.update(session)
         
-        return {
-            "answer": response.content,
+        return codec.FastJSONResponse({
+            "answer": answer,
             "features": features,
             "probability": features["question_answer_similarity"]
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
+
+@app.post("/qa/batch")
+async def qa_batch(req: BatchQARequest):
+    if not req.questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(req.questions) > QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {QA_BATCH_MAX_QUESTIONS} questions per batch")
+    
+    try:
+        # Load and tokenize the page once for every question
+        page_content, session = await resolve_page(req)
+        
+        if not page_content:
+            raise HTTPException(status_code=400, detail="Failed to extract content from the provided URL")
+        
+        prompt_content = await compact_for_prompt(page_content, COMPACT_QA_TOKENS)
+        answers = await answer_batch(prompt_content, req.questions, session)
+        
+        with stage("features"):
+            all_features = await compute_features(page_content, req.questions, answers, session)
+        if session is not None:
+            sessions.update(session)
+        
+        results = []
+        for question, answer, features in zip(req.questions, answers, all_features):
+            results.append({
+                "question": question,
+                "answer": answer,
+                "features": features,
+                "probability": features["question_answer_similarity"]
+            })
+        return codec.FastJSONResponse({"results": results})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error answering questions: {str(e)}")
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {codec.json_dumps(data).decode()}\n\n"
+
+def error_payload(error: Exception, message: str) -> dict:
+    """HTTP errors (e.g. 429 from the scheduler) keep their status"""
+    if isinstance(error, HTTPException):
+        return {
+            "status": error.status_code,
+            "detail": error.detail,
+            "retry_after": getattr(error, "retry_after", None)
         }
+    return {"status": 500, "detail": f"{message}: {str(error)}"}
+
+def sse_error(error: Exception, message: str) -> str:
+    return sse_event("error", error_payload(error, message))
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_tokens(request: Request, tokens, parts: list):
+    """Relay model tokens as SSE, stopping generation if the client goes away"""
+    async for token in tokens:
+        if await request.is_disconnected():
+            # Closing the generator cancels the upstream model stream
+            await tokens.aclose()
+            return
+        parts.append(token)
+        yield sse_event("token", {"text": token})
+
+@app.post("/summarize/stream")
+async def summarize_stream(req: SummarizeRequest, request: Request):
+    try:
+        page_content, session = await resolve_page(req)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
+    
+    if not page_content:
+        raise HTTPException(status_code=400, detail="Failed to extract content from the provided URL")
+    if session is None:
+        session = sessions.create(page_content, req.url)
+    
+    async def events():
+        try:
+            if session.summary is None and req.url and req.content:
+                session.summary = await prefetched_summary(req.url, page_content)
+                if session.summary is not None:
+                    sessions.update(session)
+            if session.summary is not None:
+                yield sse_event("done", {"summary": session.summary, "session_id": session.id})
+                return
+            template, text = await prepare_summary(await compact_for_prompt(page_content, COMPACT_SUMMARY_TOKENS))
+            parts = []
+            async for event in stream_tokens(request, stream_prompt(template, text), parts):
+                yield event
+            session.summary = "".join(parts)
+            sessions.update(session)
+            yield sse_event("done", {"summary": session.summary, "session_id": session.id})
+        except Exception as e:
+            yield sse_error(e, "Error generating summary")
+    
+    return sse_response(events())
+
+@app.post("/qa/stream")
+async def qa_stream(req: QARequest, request: Request):
+    try:
+        page_content, session = await resolve_page(req)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
+    
+    if not page_content:
+        raise HTTPException(status_code=400, detail="Failed to extract content from the provided URL")
+    
+    async def events():
+        try:
+            prompt_content = await compact_for_prompt(page_content, COMPACT_QA_TOKENS)
+            with stage("retrieval"):
+                context = await workers.run(select_qa_context, prompt_content, req.question, session, size=len(prompt_content))
+            parts = []
+            async for event in stream_tokens(request, stream_prompt(qa_template, context, req.question), parts):
+                yield event
+            answer = "".join(parts)
+            
+            # Visualization payload goes out once the answer is complete
+            with stage("features"):
+                features = (await compute_features(page_content, [req.question], [answer], session))[0]
+            if session is not None:
+                sessions.update(session)
+            yield sse_event("features", {
+                "features": features,
+                "probability": features["question_answer_similarity"]
+            })
+            yield sse_event("done", {"answer": answer})
+        except Exception as e:
+            yield sse_error(e, "Error answering question")
+    
+    return sse_response(events())
+
+# Several pages summarized in one call; model calls still share the scheduler's limits
+SUMMARY_BATCH_MAX_URLS = int(os.getenv("SUMMARY_BATCH_MAX_URLS", "20"))
+SUMMARY_BATCH_MAX_PARALLEL = int(os.getenv("SUMMARY_BATCH_MAX_PARALLEL", "8"))
+
+async def summarize_url(url: str, limit: asyncio.Semaphore) -> tuple:
+    """Fetch and summarize one page of a batch; returns an SSE event name and payload"""
+    try:
+        async with limit:
+            # Each page gets the whole request budget once it starts, not what earlier pages left
+            with resilience.deadline():
+                page_content = await load_web_page(url)
+                if not page_content:
+                    raise HTTPException(status_code=400, detail="Failed to extract content from the provided URL")
+                summary = await summarize_content(page_content)
+    except Exception as e:
+        return "error", {"url": url, **error_payload(e, "Error generating summary")}
+    
+    session = sessions.create(page_content, url)
+    session.summary = summary
+    sessions.update(session)
+    return "result", {"url": url, "summary": summary, "session_id": session.id}
+
+@app.post("/summarize/batch")
+async def summarize_batch(req: BatchSummarizeRequest, request: Request):
+    urls = list(dict.fromkeys(url for url in req.urls if url))
+    if not urls:
+        raise HTTPException(status_code=400, detail="At least one URL is required")
+    if len(urls) > SUMMARY_BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {SUMMARY_BATCH_MAX_URLS} URLs per batch")
+    
+    async def events():
+        # Pages are fetched and summarized concurrently; results go out as they finish
+        limit = asyncio.Semaphore(SUMMARY_BATCH_MAX_PARALLEL)
+        tasks = [asyncio.ensure_future(summarize_url(url, limit)) for url in urls]
+        errors = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event, payload = await next_done
+                errors += event == "error"
+                yield sse_event(event, payload)
+                if await request.is_disconnected():
+                    return
+            yield sse_event("done", {"count": len(urls), "errors": errors})
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return sse_response(events())
+
+# The extension sends the tab's own text, which never matches the server-extracted
+# text exactly, so prefetched summaries are also kept by URL. One is used for a
+# page whose text shares most of the prefetched page's top keywords.
+PREFETCH_SUMMARY_TTL = float(os.getenv("PREFETCH_SUMMARY_TTL", "600"))
+PREFETCH_MATCH_KEYWORDS = int(os.getenv("PREFETCH_MATCH_KEYWORDS", "50"))
+PREFETCH_MATCH_MIN_SHARE = float(os.getenv("PREFETCH_MATCH_MIN_SHARE", "0.6"))
+
+prefetched_summaries = {"served": 0, "mismatched": 0}
+
+async def prefetched_summary(url: str, content: str) -> Optional[str]:
+    """The summary prefetched for a URL, if it is recent and the page text matches"""
+    stored = await asyncio.to_thread(get_store().get, "prefetched_summary", url)
+    if stored is None:
+        return None
+    entry = json.loads(stored)
+    if time.time() - entry["at"] > PREFETCH_SUMMARY_TTL:
+        return None
+    content_stats = await page_keyword_stats(content)
+    shared = set(content_stats.top(PREFETCH_MATCH_KEYWORDS)).intersection(entry["keywords"])
+    if len(shared) < len(entry["keywords"]) * PREFETCH_MATCH_MIN_SHARE:
+        prefetched_summaries["mismatched"] += 1
+        return None
+    prefetched_summaries["served"] += 1
+    return entry["summary"]
+
+async def prefetch_page(url: str):
+    """Fill the page, summary, keyword and QA index caches for a URL"""
+    page_content = await load_web_page(url)
+    if not page_content:
+        return
+    # Each model call waits for capacity interactive requests leave spare
+    with llm_scheduler.background(PREFETCH_LLM_SHARE):
+        summary = await summarize_content(page_content)
+    content_stats = await page_keyword_stats(page_content)
+    entry = {"summary": summary, "keywords": content_stats.top(PREFETCH_MATCH_KEYWORDS), "at": time.time()}
+    await asyncio.to_thread(get_store().set, "prefetched_summary", url, json.dumps(entry))
+    prompt_content = await compact_for_prompt(page_content, COMPACT_QA_TOKENS)
+    if estimate_tokens(prompt_content) > QA_CONTEXT_TOKENS:
+        await workers.run(qa_indexes.get_or_build, prompt_content, build_qa_index, size=len(prompt_content))
+
+# Background warm-up that only uses LLM capacity interactive requests leave spare
+prefetcher = Prefetcher(prefetch_page, lambda: llm_scheduler.has_spare_capacity(PREFETCH_LLM_SHARE))
+
+@app.post("/prefetch", status_code=202)
+async def prefetch(req: PrefetchRequest):
+    urls = [url for url in dict.fromkeys(req.urls) if url.startswith(("http://", "https://"))]
+    if not urls:
+        raise HTTPException(status_code=400, detail="At least one http(s) URL is required")
+    if len(urls) > prefetcher.queue.max_size:
+        raise HTTPException(status_code=400, detail=f"At most {prefetcher.queue.max_size} URLs per request")
+    queued = sum(prefetcher.queue.put(url, req.priority) for url in urls)
+    return {"queued": queued, "queue_size": len(prefetcher.queue)}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "pages": page_cache.stats(),
+        "llm": llm_cache.stats(),
+        "qa_indexes": qa_indexes.stats(),
+        "keywords": keywords.memo_stats(),
+        "idf": similarity_engine.stats() if similarity_engine is not None else None,
+        "coalesced": {"fetch": fetch_flight.stats(), "llm": llm_flight.stats()},
+        "llm_scheduler": llm_scheduler.stats(),
+        "fetch": fetcher.stats(),
+        "store": await asyncio.to_thread(get_store().stats),
+        "workers": workers.stats(),
+        "sessions": sessions.stats(),
+        "summary_chunks": summary_chunks,
+        "prefetched_summaries": prefetched_summaries,
+        "prefetch": prefetcher.stats(),
+    }
+
+# Hit ratios of the caches above, read at scrape time
+metrics.register_cache_stats({
+    "pages": page_cache.stats,
+    "client_content": content_cache.stats,
+    "llm": llm_cache.stats,
+    "qa_indexes": qa_indexes.stats,
+    "keywords": keywords.memo_stats,
+    "store": store_counters,
+    "sessions": sessions.stats,
+})
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/startup")
+async def startup_timings():
+    # Import and lazy-initialization timings of this process, in milliseconds
+    return startup.report()
 
 @app.get("/health")
 async def health_check():
@@ -167,5 +892,7 @@ async def health_check():
 async def root():
     return {"message": "Interectors API is running"}
 
+startup.mark("app_import")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
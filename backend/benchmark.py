@@ -0,0 +1,261 @@
+"""
+End-to-end load test for the API using a local stub site and a fake LLM
+
+Starts a local HTTP server with HTML fixtures (5 KB up to 10 MB), runs the
+app in-process with a deterministic fake LLM provider, drives /summarize, /qa
+and /health at the requested concurrency levels and writes throughput and
+latency percentiles to a JSON file.
+
+    python benchmark.py --concurrency 1,8,32 --requests 100 --output bench_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.server
+from functools import partial
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# The real provider is never called; the app runs with the fake LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
+import httpx
+import uvicorn
+
+from llm import FakeProvider
+
+FIXTURE_SIZES = {
+    "5k": 5 * 1024,
+    "50k": 50 * 1024,
+    "500k": 500 * 1024,
+    "2m": 2 * 1024 * 1024,
+    "10m": 10 * 1024 * 1024,
+}
+
+PARAGRAPH = (
+    "<p>Machine learning systems process large amounts of research data. Neural networks, "
+    "decision trees and support vector machines are common algorithms in data science, "
+    "and deep learning has changed speech recognition and computer vision.</p>\n"
+)
+
+
+def write_fixtures(directory):
+    """Write one HTML page per fixture size"""
+    for name, size in FIXTURE_SIZES.items():
+        repeats = max(1, size // len(PARAGRAPH))
+        body = "".join(PARAGRAPH for _ in range(repeats))
+        html = (
+            "<html><head><title>Fixture</title><script>var tracking = true;</script></head>"
+            f"<body><nav>Home | About | Contact</nav><main>{body}</main><footer>Footer</footer></body></html>"
+        )
+        with open(os.path.join(directory, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class StubSiteServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # The API stops reading large pages early by design
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub_site(directory):
+    server = StubSiteServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(fake_provider):
+    """Run the app in-process with the fake model"""
+    import app
+    app.llm_scheduler.provider = fake_provider
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def loop_lag_snapshot():
+    """Cumulative event-loop lag histogram of the in-process app: (sum, count, {bound: count})"""
+    from metrics import EVENT_LOOP_LAG
+    total, count, buckets = 0.0, 0.0, {}
+    for metric in EVENT_LOOP_LAG.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_bucket"):
+                buckets[float(sample.labels["le"])] = sample.value
+            elif sample.name.endswith("_sum"):
+                total = sample.value
+            elif sample.name.endswith("_count"):
+                count = sample.value
+    return total, count, buckets
+
+
+def loop_lag_summary(before, after):
+    """Mean and approximate p99 (bucket upper bound) of lag samples taken between two snapshots"""
+    total = after[0] - before[0]
+    count = after[1] - before[1]
+    if not count:
+        return {"loop_lag_mean_ms": 0.0, "loop_lag_p99_ms": 0.0}
+    p99 = 0.0
+    for bound in sorted(after[2]):
+        if after[2][bound] - before[2][bound] >= 0.99 * count:
+            p99 = bound
+            break
+    return {
+        "loop_lag_mean_ms": round(total / count * 1000, 2),
+        "loop_lag_p99_ms": round(p99 * 1000, 2) if p99 != float("inf") else None,
+    }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_level(api_url, endpoint, page_url, concurrency, total, unique_urls):
+    """Send `total` requests to one endpoint with `concurrency` workers"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker(client):
+        nonlocal errors
+        for i in counter:
+            url = f"{page_url}?v={i}" if unique_urls else page_url
+            start = time.perf_counter()
+            try:
+                if endpoint == "health":
+                    response = await client.get(f"{api_url}/health")
+                elif endpoint == "summarize":
+                    response = await client.post(f"{api_url}/summarize", json={"url": url})
+                else:
+                    response = await client.post(f"{api_url}/qa", json={"url": url, "question": "Which algorithms are used in data science?"})
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(args):
+    fixtures = tempfile.mkdtemp(prefix="interectors-bench-")
+    write_fixtures(fixtures)
+    # Fresh caches per run (read when app is imported), so earlier runs cannot turn model calls into hits
+    os.environ["STORE_PATH"] = os.path.join(fixtures, "cache.sqlite3")
+    os.environ["IDF_STATS_PATH"] = os.path.join(fixtures, "idf_stats.npz")
+    site, site_url = start_stub_site(fixtures)
+    fake_provider = FakeProvider(latency=args.llm_latency)
+    api, api_url = start_api(fake_provider)
+
+    results = []
+    try:
+        for endpoint in args.endpoints:
+            sizes = ["-"] if endpoint == "health" else args.sizes
+            for size in sizes:
+                page_url = f"{site_url}/{size}.html"
+                for concurrency in args.concurrency:
+                    print(f"{endpoint:<10} size={size:<5} concurrency={concurrency:<4}", end=" ", flush=True)
+                    lag_before = loop_lag_snapshot()
+                    result = await run_level(api_url, endpoint, page_url, concurrency, args.requests, args.unique_urls)
+                    result.update(loop_lag_summary(lag_before, loop_lag_snapshot()))
+                    result.update({"endpoint": endpoint, "size": size, "concurrency": concurrency})
+                    results.append(result)
+                    print(f"{result['throughput_rps']:>8} req/s  p50={result['p50_ms']}ms  "
+                          f"p95={result['p95_ms']}ms  p99={result['p99_ms']}ms  loop-lag-p99={result['loop_lag_p99_ms']}ms  "
+                          f"errors={result['errors']}")
+    finally:
+        api.should_exit = True
+        site.shutdown()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "llm_latency_s": args.llm_latency,
+            "unique_urls": args.unique_urls,
+            "llm_calls": fake_provider.calls,
+        },
+        "results": results,
+    }
+
+
+def csv_list(value, cast=str):
+    return [cast(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Interectors API against a local stub site")
+    parser.add_argument("--endpoints", type=csv_list, default=["health", "summarize", "qa"])
+    parser.add_argument("--sizes", type=csv_list, default=list(FIXTURE_SIZES))
+    parser.add_argument("--concurrency", type=partial(csv_list, cast=int), default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint/size/concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake model call")
+    parser.add_argument("--unique-urls", action="store_true", help="add a query string per request to bypass caches")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    unknown = [size for size in args.sizes if size not in FIXTURE_SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)} (choose from {', '.join(FIXTURE_SIZES)})")
+
+    report = asyncio.run(run_benchmark(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Fast JSON responses and negotiated compression of responses and request bodies
+"""
+
+import os
+import json
+import zlib
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-compressed only
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+# Limit on a decompressed request body, so a small upload cannot inflate without bound
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(8 * 1024 * 1024)))
+
+# Already-compressed or streamed content is passed through unchanged
+UNCOMPRESSED_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def json_dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson when available
+
+    Endpoints return it directly to skip FastAPI's jsonable_encoder pass over
+    plain dicts and lists.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return json_dumps(content)
+
+
+def _accepted(header: str) -> set:
+    """Codings the client accepts (q=0 excluded)"""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def decompress(data: bytes, encoding: str, limit: int = MAX_REQUEST_BYTES) -> bytes:
+    """Decode a request body, raising BodyTooLarge past `limit` bytes"""
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("br")
+        decompressor = brotli.Decompressor()
+        output = bytearray()
+        # Feed in slices so the output can be checked before it grows too far
+        for start in range(0, len(data), 16384):
+            output += decompressor.process(data[start:start + 16384])
+            if len(output) > limit:
+                raise BodyTooLarge()
+        return bytes(output)
+    wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+    decompressor = zlib.decompressobj(wbits)
+    output = decompressor.decompress(data, limit + 1)
+    if len(output) > limit or decompressor.unconsumed_tail:
+        raise BodyTooLarge()
+    return output
+
+
+class CompressionMiddleware:
+    """Compresses responses (br or gzip, per Accept-Encoding) and decodes compressed request bodies"""
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name: value for name, value in scope["headers"]}
+        request_encoding = headers.get(b"content-encoding", b"identity").decode("latin-1").strip().lower()
+        if request_encoding not in ("", "identity"):
+            body = await self._read_body(receive)
+            try:
+                if request_encoding not in ("gzip", "deflate", "br"):
+                    raise ValueError(request_encoding)
+                body = decompress(body, request_encoding)
+            except BodyTooLarge:
+                await self._reject(send, 413, "Request body is too large")
+                return
+            except (ValueError, zlib.error, getattr(brotli, "error", ValueError)):
+                await self._reject(send, 400, f"Request body is not valid {request_encoding} data")
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ] + [(b"content-length", str(len(body)).encode())]
+            receive = self._replay(body, receive)
+
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, self._compressing_send(send, encoding))
+
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            # Compressed input beyond the decoded limit cannot be valid
+            if size > MAX_REQUEST_BYTES or not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay(body, receive):
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Further reads wait for the disconnect as usual
+            return await receive()
+
+        return replay
+
+    @staticmethod
+    async def _reject(send, status, detail):
+        body = json_dumps({"detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _compressing_send(self, send, encoding):
+        start_message = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                response_headers = {name.lower(): value for name, value in message.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = b"content-encoding" in response_headers or content_type.startswith(UNCOMPRESSED_TYPES)
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Streamed responses go out as they are produced
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = [
+                (name, value) for name, value in start_message.get("headers", [])
+                if name.lower() != b"content-length"
+            ]
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"vary", b"Accept-Encoding"))
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        return compressing_send
@@ -0,0 +1,97 @@
+"""
+Prompt compaction: whitespace normalization, de-duplication and trimming to a token budget
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from text_chunks import CHARS_PER_TOKEN, estimate_tokens
+
+COMPACT_MEMO_SIZE = int(os.getenv("COMPACT_MEMO_SIZE", "64"))
+# Lines with at least this many words count as main content when trimming
+COMPACT_MAIN_MIN_WORDS = int(os.getenv("COMPACT_MAIN_MIN_WORDS", "8"))
+# Only lines with at least this many words are de-duplicated; shorter repeats are
+# usually table cells or code and carry meaning where they stand
+COMPACT_DEDUP_MIN_WORDS = int(os.getenv("COMPACT_DEDUP_MIN_WORDS", "6"))
+
+SENTENCE_ENDINGS = (".", "!", "?", ":", ";", '"', ")")
+
+
+class CompactedText:
+    __slots__ = ("text", "original_tokens", "tokens")
+
+    def __init__(self, text, original_tokens, tokens):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.tokens = tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+def _is_main_content(line: str) -> bool:
+    """Sentence-like lines; short fragments are usually menus, buttons and labels"""
+    words = line.count(" ") + 1
+    return words >= COMPACT_MAIN_MIN_WORDS or (words >= 4 and line.endswith(SENTENCE_ENDINGS))
+
+
+def compact(text: str, max_tokens: int = 0) -> CompactedText:
+    """Normalize whitespace, drop repeated sentence-length lines and trim to max_tokens (0: no limit)
+
+    When trimming, short non-sentence lines go first, starting from the end of
+    the page, then main-content lines from the end; the order is preserved.
+    """
+    original_tokens = estimate_tokens(text)
+    lines = []
+    seen = set()
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line:
+            continue
+        # Repeated footers, notices and duplicated paragraphs are kept once
+        if line.count(" ") + 1 >= COMPACT_DEDUP_MIN_WORDS:
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+
+    length = sum(len(line) + 1 for line in lines)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if max_tokens and length > max_chars:
+        keep = [True] * len(lines)
+        for main in (False, True):
+            for i in range(len(lines) - 1, -1, -1):
+                if length <= max_chars:
+                    break
+                if keep[i] and _is_main_content(lines[i]) == main:
+                    keep[i] = False
+                    length -= len(lines[i]) + 1
+        lines = [line for line, kept in zip(lines, keep) if kept]
+
+    result = "\n".join(lines)
+    return CompactedText(result, original_tokens, estimate_tokens(result))
+
+
+_memo = OrderedDict()
+# compact_cached() runs on worker threads
+_memo_lock = threading.Lock()
+
+
+def compact_cached(text: str, max_tokens: int = 0) -> CompactedText:
+    """compact(), memoized by content hash for pages asked about repeatedly"""
+    key = (hashlib.sha256(text.encode("utf-8")).digest(), max_tokens)
+    with _memo_lock:
+        result = _memo.get(key)
+        if result is not None:
+            _memo.move_to_end(key)
+            return result
+    result = compact(text, max_tokens)
+    with _memo_lock:
+        _memo[key] = result
+        while len(_memo) > COMPACT_MEMO_SIZE:
+            _memo.popitem(last=False)
+    return result
@@ -0,0 +1,193 @@
+"""
+Incremental HTML to text extraction with boilerplate removal and a size budget
+"""
+
+import os
+import re
+from html.parser import HTMLParser
+
+# Stop once this much main-content text has been collected
+MAX_CONTENT_CHARS = int(os.getenv("MAX_CONTENT_CHARS", "200000"))
+# When boilerplate removal keeps less than this share of the visible text, the
+# heuristics most likely matched a page wrapper and all visible text is used instead
+MIN_MAIN_SHARE = float(os.getenv("EXTRACT_MIN_MAIN_SHARE", "0.1"))
+
+# Elements whose content is never visible text
+HIDDEN_TAGS = frozenset({"script", "style", "noscript", "template", "svg", "canvas", "iframe", "object"})
+
+# Elements whose content is rarely page text (forms are not: ASP.NET wraps whole pages in one)
+SKIP_TAGS = HIDDEN_TAGS | {"nav", "footer", "aside", "button", "select", "dialog"}
+
+# Elements without end tags
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr",
+})
+
+# Elements that end a line of text
+BLOCK_TAGS = frozenset({
+    "address", "article", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "ol", "p", "pre",
+    "section", "table", "td", "th", "title", "tr", "ul",
+})
+
+BOILERPLATE_ROLES = frozenset({"navigation", "banner", "contentinfo", "complementary", "dialog", "alertdialog", "search"})
+
+# Matched as whole words of id/class values (e.g. "cookie-banner", "site_footer")
+BOILERPLATE_NAMES = re.compile(
+    r"(?:^|[\s_-])(?:cookies?|consent|gdpr|banner|newsletter|subscribe|share|sharing|social|"
+    r"breadcrumbs?|nav|navbar|menu|sidebar|footer|advert|ads?|promo|popup|modal)(?:$|[\s_-])",
+    re.IGNORECASE,
+)
+
+# State classes such as "has-sidebar", "no-sidebar" or "modal-open" describe the page, not boilerplate
+STATE_NAME_PREFIXES = ("has-", "no-")
+STATE_NAME_SUFFIXES = ("-open",)
+
+# Page wrappers whose id/class names often mention a sidebar or menu that the page has
+CONTENT_CONTAINERS = frozenset({"html", "body", "main", "article"})
+
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+
+
+class _Lines:
+    """Text collected line by line up to a character budget"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.lines = []
+        self.length = 0
+        self._line = []
+        self._line_length = 0
+
+    @property
+    def full(self) -> bool:
+        return self.length + self._line_length >= self.max_chars
+
+    def add(self, data):
+        if not self.full:
+            self._line.append(data)
+            self._line_length += len(data)
+
+    def end_line(self):
+        if not self._line:
+            return
+        line = " ".join("".join(self._line).split())
+        self._line = []
+        self._line_length = 0
+        if line:
+            room = self.max_chars - self.length
+            line = line[:room]
+            self.lines.append(line)
+            self.length += len(line) + 1
+
+    def text(self) -> str:
+        self.end_line()
+        return "\n".join(self.lines)
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Feed HTML in pieces; collects visible main-content text until the budget is reached
+
+    All visible text is collected alongside, and returned instead when
+    boilerplate removal leaves nothing or next to nothing.
+    """
+
+    def __init__(self, max_chars=MAX_CONTENT_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.main = _Lines(max_chars)
+        self.visible = _Lines(max_chars)
+        # Open elements as (tag, skipped, hidden) tuples
+        self._stack = []
+        self._skip_depth = 0
+        self._hidden_depth = 0
+        self._content_depth = 0
+
+    @property
+    def full(self) -> bool:
+        return self.main.full or self.visible.full
+
+    def _is_hidden(self, tag, attrs):
+        if tag in HIDDEN_TAGS:
+            return True
+        if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+            return True
+        return bool(HIDDEN_STYLE.search(attrs.get("style") or ""))
+
+    def _is_boilerplate(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            return True
+        # Site headers are boilerplate, article headers are not
+        if tag == "header" and not self._content_depth:
+            return True
+        if attrs.get("role") in BOILERPLATE_ROLES:
+            return True
+        if tag in CONTENT_CONTAINERS:
+            return False
+        names = f"{attrs.get('id') or ''} {attrs.get('class') or ''}".lower().split()
+        return any(
+            BOILERPLATE_NAMES.search(name) for name in names
+            if not name.startswith(STATE_NAME_PREFIXES) and not name.endswith(STATE_NAME_SUFFIXES)
+        )
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._end_line()
+        if tag in VOID_TAGS:
+            return
+        attrs = dict(attrs)
+        hidden = self._hidden_depth > 0 or self._is_hidden(tag, attrs)
+        skipped = hidden or self._skip_depth > 0 or self._is_boilerplate(tag, attrs)
+        self._stack.append((tag, skipped, hidden))
+        if hidden:
+            self._hidden_depth += 1
+        if skipped:
+            self._skip_depth += 1
+        elif tag in ("main", "article"):
+            self._content_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._end_line()
+        # Close up to the matching element; stray end tags are ignored
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                for open_tag, skipped, hidden in self._stack[i:]:
+                    if hidden:
+                        self._hidden_depth -= 1
+                    if skipped:
+                        self._skip_depth -= 1
+                    elif open_tag in ("main", "article"):
+                        self._content_depth -= 1
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        if not self._hidden_depth:
+            self.visible.add(data)
+        if not self._skip_depth:
+            self.main.add(data)
+
+    def _end_line(self):
+        self.main.end_line()
+        self.visible.end_line()
+
+    def text(self) -> str:
+        main = self.main.text()
+        visible = self.visible.text()
+        if len(main) < len(visible) * MIN_MAIN_SHARE:
+            return visible
+        return main
+
+
+def html_to_text(html: str, max_chars=MAX_CONTENT_CHARS) -> str:
+    """Extract main-content text from a complete HTML document"""
+    extractor = HTMLTextExtractor(max_chars)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
@@ -0,0 +1,262 @@
+"""
+Async page fetching with a shared, pooled HTTP client
+"""
+
+import os
+import time
+import codecs
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+import workers
+import resilience
+from extractor import HTMLTextExtractor, MAX_CONTENT_CHARS
+
+# Connection pool settings (override through environment variables)
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "100"))
+FETCH_MAX_KEEPALIVE = int(os.getenv("FETCH_MAX_KEEPALIVE", "20"))
+FETCH_PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "6"))
+# Hosts whose connection limits are remembered; idle ones beyond this are forgotten
+FETCH_MAX_HOSTS = int(os.getenv("FETCH_MAX_HOSTS", "1024"))
+FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+FETCH_READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "15"))
+# Stop downloading after this many bytes even if the text budget is not reached
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+# Decoded text is handed to the parser in batches of about this many characters
+FETCH_PARSE_BATCH_CHARS = int(os.getenv("FETCH_PARSE_BATCH_CHARS", "65536"))
+# Cap on a whole fetch (the read timeout only bounds the gap between chunks)
+FETCH_TOTAL_TIMEOUT = float(os.getenv("FETCH_TOTAL_TIMEOUT", "30"))
+# Start a second request to a page that is slower than the recent p95 fetch
+FETCH_HEDGE = os.getenv("FETCH_HEDGE", "0") == "1"
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_TYPES = ("text/plain",)
+
+DEFAULT_HEADERS = {
+    "User-Agent": os.getenv("USER_AGENT", "Mozilla/5.0 (compatible; InterectorsBot/1.0)"),
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+}
+
+_client = None
+# host -> [semaphore, fetches holding or waiting for it], least recently used first
+_host_limits = OrderedDict()
+host_breakers = resilience.BreakerRegistry(max_size=FETCH_MAX_HOSTS)
+fetch_hedger = resilience.Hedger(FETCH_HEDGE)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared keep-alive client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=FETCH_MAX_CONNECTIONS,
+                max_keepalive_connections=FETCH_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(FETCH_READ_TIMEOUT, connect=FETCH_CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+@asynccontextmanager
+async def _host_slot(url: str):
+    """Hold one of the connections a host may have open at once"""
+    host = urlsplit(url).netloc.lower()
+    entry = _host_limits.get(host)
+    if entry is None:
+        entry = _host_limits[host] = [asyncio.Semaphore(FETCH_PER_HOST_LIMIT), 1]
+        _forget_idle_hosts()
+    else:
+        _host_limits.move_to_end(host)
+        entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+
+
+def _forget_idle_hosts():
+    # Only hosts nobody is fetching from are dropped, so no limit is lost while in use
+    excess = len(_host_limits) - FETCH_MAX_HOSTS
+    if excess > 0:
+        for host in [host for host, (_, users) in _host_limits.items() if not users][:excess]:
+            del _host_limits[host]
+
+
+class UnsupportedContent(HTTPException):
+    def __init__(self, content_type):
+        super().__init__(status_code=415, detail=f"Unsupported page content type: {content_type or 'unknown'}")
+
+
+class UpstreamError(HTTPException):
+    def __init__(self, detail):
+        super().__init__(status_code=502, detail=detail)
+
+
+class PlainTextCollector:
+    """Same feed interface as HTMLTextExtractor for text/plain responses"""
+
+    def __init__(self, max_chars=MAX_CONTENT_CHARS):
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+
+    @property
+    def full(self):
+        return self.length >= self.max_chars
+
+    def feed(self, data):
+        data = data[:self.max_chars - self.length]
+        self.parts.append(data)
+        self.length += len(data)
+
+    def close(self):
+        pass
+
+    def text(self):
+        return "".join(self.parts).strip()
+
+
+class FetchedPage:
+    __slots__ = ("status_code", "text", "etag", "last_modified", "bytes_read", "parse_seconds")
+
+    def __init__(self, status_code, text="", etag=None, last_modified=None, bytes_read=0, parse_seconds=0.0):
+        self.status_code = status_code
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.bytes_read = bytes_read
+        self.parse_seconds = parse_seconds
+
+
+async def fetch_page(url: str, headers: dict = None, max_chars: int = MAX_CONTENT_CHARS) -> FetchedPage:
+    """Fetch a page within the request deadline, failing fast while its host is down
+    
+    Timeouts, connection errors and 5xx responses count against the host's
+    circuit breaker; they surface as 504 and 502 rather than a generic error.
+    """
+    breaker = host_breakers.get(urlsplit(url).netloc.lower())
+    breaker.check()
+    try:
+        page = await resilience.within(
+            fetch_hedger.run(lambda: _fetch_once(url, headers, max_chars)), "the page", FETCH_TOTAL_TIMEOUT)
+    except resilience.DeadlineExceeded as e:
+        breaker.record_timeout(e)
+        raise
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        if status >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise UpstreamError(f"The page returned HTTP {status}") from e
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        raise UpstreamError(f"Failed to fetch the page ({type(e).__name__})") from e
+    except HTTPException:
+        # Answered, just not with a usable page
+        breaker.record_success()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
+    return page
+
+
+async def _fetch_once(url: str, headers: dict = None, max_chars: int = MAX_CONTENT_CHARS) -> FetchedPage:
+    """Stream a page and extract its main text as bytes arrive
+    
+    Non-HTML responses are rejected before the body is read, and the download
+    stops once max_chars of text (or FETCH_MAX_BYTES) has been collected.
+    """
+    async with _host_slot(url):
+        async with get_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return FetchedPage(304)
+            response.raise_for_status()
+            
+            content_type = response.headers.get("content-type", "")
+            media_type = content_type.split(";")[0].strip().lower()
+            if media_type in HTML_TYPES or not media_type:
+                extractor = HTMLTextExtractor(max_chars)
+            elif media_type in TEXT_TYPES:
+                extractor = PlainTextCollector(max_chars)
+            else:
+                raise UnsupportedContent(media_type)
+            
+            decoder = codecs.getincrementaldecoder(_charset(content_type))(errors="replace")
+            bytes_read = 0
+            parse_seconds = 0.0
+            pending = []
+            pending_chars = 0
+            async for chunk in response.aiter_bytes():
+                bytes_read += len(chunk)
+                data = decoder.decode(chunk)
+                pending.append(data)
+                pending_chars += len(data)
+                if pending_chars < FETCH_PARSE_BATCH_CHARS and bytes_read < FETCH_MAX_BYTES:
+                    continue
+                # The parser keeps state between batches, so it runs on a thread rather than a process
+                start = time.perf_counter()
+                await workers.run(extractor.feed, "".join(pending), size=pending_chars)
+                parse_seconds += time.perf_counter() - start
+                pending = []
+                pending_chars = 0
+                if extractor.full or bytes_read >= FETCH_MAX_BYTES:
+                    break
+            
+            pending.append(decoder.decode(b"", final=True))
+            start = time.perf_counter()
+            text = await workers.run(_finish, extractor, "".join(pending), size=pending_chars)
+            parse_seconds += time.perf_counter() - start
+            return FetchedPage(
+                response.status_code,
+                text,
+                response.headers.get("etag"),
+                response.headers.get("last-modified"),
+                bytes_read,
+                parse_seconds,
+            )
+
+
+def _finish(extractor, data: str) -> str:
+    extractor.feed(data)
+    extractor.close()
+    return extractor.text()
+
+
+def _charset(content_type: str) -> str:
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            charset = value.strip().strip('"\'')
+            try:
+                codecs.lookup(charset)
+                return charset
+            except LookupError:
+                break
+    return "utf-8"
+
+
+def stats():
+    return {
+        "breakers": host_breakers.stats(),
+        "hedging": fetch_hedger.stats(),
+    }
+
+
+async def close_client():
+    """Close the shared client (called on application shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
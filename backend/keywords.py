@@ -0,0 +1,134 @@
+"""
+Single-pass keyword extraction with per-content memoization
+"""
+
+import os
+import re
+import json
+import hashlib
+from collections import Counter, OrderedDict
+
+from store import get_store
+
+KEYWORD_MEMO_SIZE = int(os.getenv("KEYWORD_MEMO_SIZE", "256"))
+# Keyword counts of texts at least this long are kept in the persistent store
+KEYWORD_PERSIST_MIN_CHARS = int(os.getenv("KEYWORD_PERSIST_MIN_CHARS", "20000"))
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did',
+    'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can',
+    'this', 'that', 'these', 'those',
+})
+
+
+def tokenize(text: str) -> list:
+    """Lowercased words longer than three characters that are not stop words"""
+    return [word for word in PUNCTUATION.sub('', text.lower()).split()
+            if len(word) > 3 and word not in STOP_WORDS]
+
+
+def count_keywords(text: str) -> Counter:
+    """Keyword frequencies of text (module-level so worker processes can run it)"""
+    return Counter(tokenize(text))
+
+
+class KeywordStats:
+    """Keyword frequencies of one text; the keys double as its keyword set"""
+
+    __slots__ = ("counts", "key", "vector", "_top", "_top_n")
+
+    def __init__(self, text: str, key=None, counts=None):
+        self.counts = counts if counts is not None else count_keywords(text)
+        # Content hash and cached similarity vector for memoized page content
+        self.key = key
+        self.vector = None
+        self._top = None
+        self._top_n = 0
+
+    def top(self, n: int) -> list:
+        """Most frequent keywords (ties keep first-seen order)"""
+        if self._top is None or self._top_n < n:
+            self._top = [kw for kw, _ in self.counts.most_common(n)]
+            self._top_n = n
+        return self._top[:n]
+
+
+_memo = OrderedDict()
+memo_hits = 0
+memo_misses = 0
+
+
+def content_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def content_stats(text: str) -> KeywordStats:
+    """KeywordStats for page content, memoized by content hash (blocking: may use the store)"""
+    key = content_key(text)
+    stats = cached_stats(key)
+    if stats is None:
+        stats = load_stats(key, len(text))
+        if stats is None:
+            stats = KeywordStats(text, key)
+            save_stats(key, stats, len(text))
+        remember(key, stats)
+    return stats
+
+
+def persisted(length: int) -> bool:
+    # Smaller texts are cheaper to re-tokenize than to load from the store
+    return length >= KEYWORD_PERSIST_MIN_CHARS
+
+
+def cached_stats(key: bytes):
+    """Memoized KeywordStats for a content hash, or None"""
+    global memo_hits, memo_misses
+    stats = _memo.get(key)
+    if stats is not None:
+        _memo.move_to_end(key)
+        memo_hits += 1
+        return stats
+    memo_misses += 1
+    return None
+
+
+def load_stats(key: bytes, length: int):
+    """Persisted KeywordStats of a large page, or None
+
+    Reads SQLite and decodes the counts, so async callers run it on a thread.
+    """
+    if not persisted(length):
+        return None
+    stored = get_store().get("keywords", key.hex())
+    if stored is None:
+        return None
+    # JSON keeps insertion order, so ties in top() resolve the same way
+    return KeywordStats("", key, Counter(json.loads(stored)))
+
+
+def save_stats(key: bytes, stats: KeywordStats, length: int):
+    """Share a large page's counts with other workers through the store (blocking)"""
+    if persisted(length):
+        get_store().set("keywords", key.hex(), json.dumps(stats.counts))
+
+
+def remember(key: bytes, stats: KeywordStats) -> KeywordStats:
+    """Memoize stats in process"""
+    _memo[key] = stats
+    while len(_memo) > KEYWORD_MEMO_SIZE:
+        _memo.popitem(last=False)
+    return stats
+
+
+def extract_keywords_optimized(text: str, top_n: int = None) -> list:
+    """Keyword/frequency records for text, most frequent first"""
+    stats = content_stats(text)
+    return [{"keyword": keyword, "frequency": frequency}
+            for keyword, frequency in stats.counts.most_common(top_n)]
+
+
+def memo_stats():
+    return {"entries": len(_memo), "hits": memo_hits, "misses": memo_misses}
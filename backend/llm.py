@@ -0,0 +1,365 @@
+"""
+LLM providers and the scheduler that keeps calls within quota
+"""
+
+import os
+import abc
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+
+import startup
+import resilience
+from text_chunks import estimate_tokens
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gemini-1.5-flash")
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "1000"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+# Longest a caller may wait for rate budget before getting a 429
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", "10"))
+# Added to the prompt estimate when reserving tokens per minute
+LLM_OUTPUT_TOKENS = int(os.getenv("LLM_OUTPUT_TOKENS", "300"))
+# Cap on one model call (or one stream), on top of the request deadline
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Send a second call when one is slower than the recent p95, only while this share of capacity is free
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_SHARE = float(os.getenv("LLM_HEDGE_SHARE", "0.5"))
+# How often a background call waiting for spare capacity checks again
+LLM_BACKGROUND_POLL_SECONDS = float(os.getenv("LLM_BACKGROUND_POLL_SECONDS", "0.5"))
+
+# Share of capacity the current task's calls may use, set for background work (None: interactive)
+_background_share = ContextVar("llm_background_share", default=None)
+
+
+class LLMOverloaded(HTTPException):
+    """Quota or queue exhausted; surfaces as 429 with Retry-After"""
+
+    def __init__(self, retry_after: float, detail="The language model is at capacity, please retry shortly"):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=429, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+
+class LLMError(HTTPException):
+    """The provider failed or returned an error; surfaces as 502"""
+
+    def __init__(self, error: Exception):
+        super().__init__(status_code=502, detail=f"The language model request failed ({type(error).__name__})")
+
+
+class LLMProvider(abc.ABC):
+    """Interface implemented by chat model backends"""
+
+    model_name = "unknown"
+
+    @abc.abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Return the complete reply to a prompt"""
+
+    async def stream(self, prompt: str):
+        """Yield text pieces as they are generated"""
+        yield await self.generate(prompt)
+
+
+class GeminiProvider(LLMProvider):
+    model_name = LLM_MODEL_NAME
+
+    def __init__(self, model_name=LLM_MODEL_NAME, api_key=None):
+        # Imported here: langchain and the Gemini client dominate cold start
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        self.model_name = model_name
+        self.model = ChatGoogleGenerativeAI(model=model_name, google_api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+
+    async def generate(self, prompt):
+        try:
+            response = await self.model.ainvoke(prompt)
+        except Exception as e:
+            _raise_if_quota(e)
+            raise
+        return response.content
+
+    async def stream(self, prompt):
+        try:
+            async for chunk in self.model.astream(prompt):
+                if chunk.content:
+                    yield chunk.content
+        except Exception as e:
+            _raise_if_quota(e)
+            raise
+
+
+def _raise_if_quota(error):
+    """Translate upstream quota errors into LLMOverloaded"""
+    if getattr(error, "code", None) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        raise LLMOverloaded(60, detail="The language model quota is exhausted, please retry later") from error
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic local model with configurable latency (tests and benchmarks)"""
+
+    model_name = "fake"
+
+    def __init__(self, latency=0.2, tokens=60):
+        self.latency = latency
+        self.tokens = tokens
+        self.calls = 0
+
+    def _reply(self, prompt):
+        self.calls += 1
+        return " ".join(f"word{(len(prompt) + i) % 97}" for i in range(self.tokens))
+
+    async def generate(self, prompt):
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def stream(self, prompt):
+        words = self._reply(prompt).split(" ")
+        for word in words:
+            await asyncio.sleep(self.latency / len(words))
+            yield word + " "
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+
+def create_provider(name=LLM_PROVIDER) -> LLMProvider:
+    return PROVIDERS[name]()
+
+
+class TokenBucket:
+    """Refills `rate` units per minute up to `capacity`; reservations may go negative"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount) -> float:
+        """Seconds until `amount` units would be available"""
+        self._refill()
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+    def fill_ratio(self) -> float:
+        """Share of the capacity currently available"""
+        self._refill()
+        return self.tokens / self.capacity if self.capacity else 0.0
+
+
+class LLMScheduler:
+    """Limits in-flight calls and request/token rates, rejecting early when saturated"""
+
+    def __init__(self, provider: LLMProvider = None, provider_name=LLM_PROVIDER, max_in_flight=LLM_MAX_IN_FLIGHT,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE, tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 max_queue=LLM_MAX_QUEUE, max_wait=LLM_MAX_WAIT):
+        # The provider (and its client) is created on first use
+        self._provider = provider
+        self.provider_name = provider_name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        # Created on first use: on older Pythons a semaphore binds to the loop current at creation
+        self._slots = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+        self.background_in_flight = 0
+        self.deferred = 0
+        # Moving average of call duration, used for Retry-After hints
+        self.avg_latency = 1.0
+        self.breaker = resilience.CircuitBreaker(f"The language model ({provider_name})")
+        self.hedger = resilience.Hedger(LLM_HEDGE)
+
+    @property
+    def provider(self) -> LLMProvider:
+        if self._provider is None:
+            with startup.record("llm_provider"):
+                self._provider = create_provider(self.provider_name)
+        return self._provider
+
+    @provider.setter
+    def provider(self, provider: LLMProvider):
+        self._provider = provider
+
+    @property
+    def model_name(self):
+        # Known without constructing the provider, so cache hits stay cheap
+        if self._provider is not None:
+            return self._provider.model_name
+        return PROVIDERS[self.provider_name].model_name
+
+    def _slot_semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self._slots
+
+    @contextmanager
+    def background(self, share: float):
+        """Calls made inside wait for spare capacity and together use at most `share` of the slots"""
+        token = _background_share.set(share)
+        try:
+            yield
+        finally:
+            _background_share.reset(token)
+
+    @asynccontextmanager
+    async def slot(self, prompt: str):
+        """Hold one in-flight slot with rate budget reserved for the prompt
+
+        Background calls first wait until interactive traffic leaves capacity spare.
+        """
+        share = _background_share.get()
+        if share is None:
+            async with self._slot(prompt):
+                yield
+            return
+
+        while self.background_in_flight >= self.max_in_flight * share or not self.has_spare_capacity(share):
+            self.deferred += 1
+            await asyncio.sleep(LLM_BACKGROUND_POLL_SECONDS)
+        self.background_in_flight += 1
+        try:
+            async with self._slot(prompt):
+                yield
+        finally:
+            self.background_in_flight -= 1
+
+    @asynccontextmanager
+    async def _slot(self, prompt: str):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloaded(self.avg_latency * (self.waiting + 1) / self.max_in_flight)
+
+        self.waiting += 1
+        try:
+            await self._slot_semaphore().acquire()
+        finally:
+            self.waiting -= 1
+
+        try:
+            tokens = estimate_tokens(prompt) + LLM_OUTPUT_TOKENS
+            delay = max(self.request_bucket.delay_for(1), self.token_bucket.delay_for(tokens))
+            if delay > self.max_wait:
+                self.rejected += 1
+                raise LLMOverloaded(delay)
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            self.in_flight += 1
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+                self.avg_latency = 0.9 * self.avg_latency + 0.1 * (time.monotonic() - start)
+        finally:
+            self._slots.release()
+
+    def has_spare_capacity(self, share: float) -> bool:
+        """Whether background work may start a call without delaying interactive ones
+
+        Background calls may use up to `share` of the in-flight slots, and only
+        while the rate budgets are more than (1 - share) full.
+        """
+        if self.waiting or self.in_flight >= self.max_in_flight * share:
+            return False
+        reserve = 1.0 - share
+        return self.request_bucket.fill_ratio() > reserve and self.token_bucket.fill_ratio() > reserve
+
+    async def _generate_once(self, prompt: str) -> str:
+        async with self.slot(prompt):
+            return await self.provider.generate(prompt)
+
+    async def generate(self, prompt: str) -> str:
+        """One model call within the request deadline, failing fast while the provider is down"""
+        self.breaker.check()
+        try:
+            text = await resilience.within(
+                self.hedger.run(lambda: self._generate_once(prompt),
+                                allowed=lambda: self.has_spare_capacity(LLM_HEDGE_SHARE)),
+                "the language model", LLM_TIMEOUT)
+        except LLMOverloaded:
+            # Our own limits, not a sign of an unhealthy provider
+            self.breaker.release()
+            raise
+        except resilience.DeadlineExceeded as e:
+            self.breaker.record_timeout(e)
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            if isinstance(e, HTTPException):
+                raise
+            raise LLMError(e) from e
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return text
+
+    async def _stream_once(self, prompt: str):
+        async with self.slot(prompt):
+            async for piece in self.provider.stream(prompt):
+                yield piece
+
+    async def stream(self, prompt: str):
+        self.breaker.check()
+        try:
+            async for piece in resilience.stream_within(self._stream_once(prompt), "the language model", LLM_TIMEOUT):
+                yield piece
+        except LLMOverloaded:
+            self.breaker.release()
+            raise
+        except resilience.DeadlineExceeded as e:
+            self.breaker.record_timeout(e)
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            if isinstance(e, HTTPException):
+                raise
+            raise LLMError(e) from e
+        except BaseException:
+            # Closed early by the caller
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+    def stats(self):
+        return {
+            "provider": type(self._provider).__name__ if self._provider is not None else self.provider_name,
+            "model": self.model_name,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "background_in_flight": self.background_in_flight,
+            "deferred": self.deferred,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "avg_latency_s": round(self.avg_latency, 3),
+            "breaker": self.breaker.stats(),
+            "hedging": self.hedger.stats(),
+        }
@@ -0,0 +1,148 @@
+"""
+Content-hash keyed cache of LLM results (summaries and answers)
+"""
+
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+from store import get_store
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "persistent")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences share a cache entry"""
+    return " ".join(text.split())
+
+
+def make_key(template: str, model_name: str, content: str, question: str = None) -> str:
+    """Hash of everything that determines the model output"""
+    digest = hashlib.sha256()
+    parts = [template, model_name, normalize_text(content)]
+    if question is not None:
+        parts.append(normalize_text(question).lower())
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class MemoryBackend:
+    """Bounded in-process LRU"""
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+
+class PersistentBackend:
+    """In-process LRU in front of the store shared by all workers"""
+
+    def __init__(self):
+        self.memory = MemoryBackend()
+
+    @property
+    def store(self):
+        # Resolved on first lookup so importing the app does not open the database
+        return get_store()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None:
+            value = self.store.get("llm", key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self.store.set("llm", key, value)
+
+    async def aget(self, key):
+        # The LRU is only touched on the event loop; SQLite and zlib run on a thread
+        value = self.memory.get(key)
+        if value is None:
+            value = await asyncio.to_thread(self.store.get, "llm", key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def aset(self, key, value):
+        self.memory.set(key, value)
+        await asyncio.to_thread(self.store.set, "llm", key, value)
+
+
+class NullBackend:
+    """Disables caching"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "persistent": PersistentBackend,
+    # The former one-file-per-entry backend; the store is on disk and size-capped
+    "disk": PersistentBackend,
+    "none": NullBackend,
+}
+
+
+class LLMCache:
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else BACKENDS[LLM_CACHE_BACKEND]()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Blocking lookup, for scripts and worker threads"""
+        return self._count(self.backend.get(key))
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    async def aget(self, key):
+        """Lookup from the event loop; backends with I/O do it on a thread"""
+        aget = getattr(self.backend, "aget", None)
+        return self._count(await aget(key) if aget is not None else self.backend.get(key))
+
+    async def aset(self, key, value):
+        aset = getattr(self.backend, "aset", None)
+        if aset is not None:
+            await aset(key, value)
+        else:
+            self.backend.set(key, value)
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
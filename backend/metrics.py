@@ -0,0 +1,175 @@
+"""
+Prometheus metrics and per-request Server-Timing breakdown
+"""
+
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+STAGE_SECONDS = Histogram(
+    "interectors_stage_seconds", "Time spent in each processing stage", ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUEST_SECONDS = Histogram(
+    "interectors_request_seconds", "End-to-end request latency", ["endpoint"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+PROMPT_TOKENS = Histogram(
+    "interectors_prompt_tokens", "Estimated tokens per model prompt",
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+PROMPT_TOKENS_SAVED = Histogram(
+    "interectors_prompt_tokens_saved", "Estimated prompt tokens removed by compaction per request",
+    buckets=(0, 100, 500, 1000, 2500, 5000, 10000, 25000, 50000),
+)
+PAGE_CHARS = Histogram(
+    "interectors_page_chars", "Characters of extracted page text",
+    buckets=(1000, 5000, 10000, 50000, 100000, 500000, 1000000, 5000000),
+)
+IN_FLIGHT = Gauge("interectors_in_flight_requests", "Requests currently being served", ["endpoint"])
+EVENT_LOOP_LAG = Histogram(
+    "interectors_event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+UPSTREAM_ERRORS = Counter("interectors_upstream_errors_total", "Errors from upstream dependencies", ["upstream", "type"])
+
+_request_timings = ContextVar("request_timings", default=None)
+_request_tokens_saved = ContextVar("request_tokens_saved", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block, recording it in the histogram and the request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        observe_stage(name, end - start, end)
+
+
+def observe_stage(name: str, seconds: float, end: float = None):
+    """Record a stage duration measured elsewhere (ending now unless `end` is given)"""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        if end is None:
+            end = time.perf_counter()
+        timings.setdefault(name, []).append((end - seconds, end))
+
+
+def wall_time(intervals: list) -> float:
+    """Time covered by possibly overlapping (start, end) intervals"""
+    total = 0.0
+    reach = None
+    for start, end in sorted(intervals):
+        if reach is None or start >= reach:
+            total += end - start
+            reach = end
+        elif end > reach:
+            total += end - reach
+            reach = end
+    return total
+
+
+async def monitor_event_loop(interval: float = 0.05):
+    """Sample event-loop lag: work that blocks the loop delays every other request"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+def record_tokens_saved(tokens: int):
+    """Count prompt tokens removed by compaction, for the histogram and the request's header"""
+    PROMPT_TOKENS_SAVED.observe(tokens)
+    saved = _request_tokens_saved.get()
+    if saved is not None:
+        saved[0] += tokens
+
+
+def record_error(upstream: str, error: Exception):
+    # Label with the original error when it was wrapped into an HTTP error
+    UPSTREAM_ERRORS.labels(upstream, type(error.__cause__ or error).__name__).inc()
+
+
+def server_timing(timings: dict, total: float) -> str:
+    """Format stage timings as a Server-Timing header value (milliseconds of wall time per stage)"""
+    entries = [f"{name};dur={wall_time(intervals) * 1000:.1f}" for name, intervals in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """Tracks in-flight requests and latency, and adds a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+        self._paths = None
+
+    def _endpoint(self, scope):
+        # Only label known routes so arbitrary paths cannot explode cardinality
+        if self._paths is None:
+            self._paths = {getattr(route, "path", None) for route in scope["app"].routes}
+        return scope["path"] if scope["path"] in self._paths else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        timings = {}
+        tokens_saved = [0]
+        token = _request_timings.set(timings)
+        saved_token = _request_tokens_saved.set(tokens_saved)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, time.perf_counter() - start).encode()))
+                if tokens_saved[0]:
+                    headers.append((b"x-prompt-tokens-saved", str(tokens_saved[0]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        IN_FLIGHT.labels(endpoint).inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            IN_FLIGHT.labels(endpoint).dec()
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+            _request_timings.reset(token)
+            _request_tokens_saved.reset(saved_token)
+
+
+class CacheStatsCollector:
+    """Exposes hit/miss counters of the in-process caches at scrape time"""
+
+    def __init__(self, sources: dict):
+        self.sources = sources
+
+    def collect(self):
+        hits = GaugeMetricFamily("interectors_cache_hits", "Cache hits", labels=["cache"])
+        misses = GaugeMetricFamily("interectors_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("interectors_cache_hit_ratio", "Cache hit ratio", labels=["cache"])
+        for name, stats in self.sources.items():
+            values = stats()
+            hit_count = values.get("hits", 0)
+            miss_count = values.get("misses", 0) + values.get("stale", 0)
+            hits.add_metric([name], hit_count)
+            misses.add_metric([name], miss_count)
+            lookups = hit_count + miss_count
+            ratio.add_metric([name], hit_count / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+def register_cache_stats(sources: dict):
+    REGISTRY.register(CacheStatsCollector(sources))
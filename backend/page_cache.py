@@ -0,0 +1,106 @@
+"""
+In-process cache of extracted page text keyed by URL
+"""
+
+import os
+import sys
+import time
+from collections import OrderedDict
+
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "300"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class CacheEntry:
+    __slots__ = ("text", "etag", "last_modified", "fetched_at", "size")
+
+    def __init__(self, text, etag=None, last_modified=None, fetched_at=None):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        # Wall-clock time so entries loaded from the shared store age correctly
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.size = sys.getsizeof(text)
+
+
+class PageCache:
+    """LRU cache of page text with a byte cap, a TTL and HTTP validators"""
+
+    def __init__(self, max_bytes=PAGE_CACHE_MAX_BYTES, ttl=PAGE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def lookup(self, url):
+        """Return the cached entry for a URL (fresh or stale) or None"""
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(url)
+        if self.is_fresh(entry):
+            self.hits += 1
+        else:
+            self.stale += 1
+        return entry
+
+    def peek(self, url):
+        """Return an entry without counting a lookup"""
+        return self._entries.get(url)
+
+    def is_fresh(self, entry):
+        return time.time() - entry.fetched_at < self.ttl
+
+    def validators(self, entry):
+        """Conditional GET headers for revalidating a stale entry"""
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def mark_revalidated(self, url):
+        """Restart the TTL of an entry the origin confirmed as unchanged (304)"""
+        entry = self._entries.get(url)
+        if entry is not None:
+            entry.fetched_at = time.time()
+            self.revalidated += 1
+
+    def store(self, url, text, etag=None, last_modified=None, fetched_at=None):
+        self.discard(url)
+        entry = CacheEntry(text, etag, last_modified, fetched_at)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[url] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def discard(self, url):
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self):
+        lookups = self.hits + self.stale + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
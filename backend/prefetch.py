@@ -0,0 +1,118 @@
+"""
+Background prefetch of pages likely to be requested next
+"""
+
+import os
+import heapq
+import asyncio
+import itertools
+
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "500"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+# Share of LLM slots and rate budget prefetching may use
+PREFETCH_LLM_SHARE = float(os.getenv("PREFETCH_LLM_SHARE", "0.5"))
+# How often a waiting worker checks for spare capacity again
+PREFETCH_POLL_SECONDS = float(os.getenv("PREFETCH_POLL_SECONDS", "0.5"))
+
+
+class PrefetchQueue:
+    """Bounded priority queue of URLs; a URL is queued once, at its highest priority"""
+
+    def __init__(self, max_size=PREFETCH_QUEUE_SIZE):
+        self.max_size = max_size
+        self._heap = []
+        # URL -> priority of its live heap entry; other entries for it are stale
+        self._queued = {}
+        self._order = itertools.count()
+        # Created on first use: on older Pythons an event binds to the loop current at creation
+        self._ready = None
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._queued)
+
+    def put(self, url: str, priority: int = 0) -> bool:
+        """Queue a URL (higher priority runs sooner); False if it was not queued"""
+        current = self._queued.get(url)
+        if current is not None and current >= priority:
+            return False
+        if current is None and len(self._queued) >= self.max_size:
+            lowest_url = min(self._queued, key=self._queued.get)
+            if self._queued[lowest_url] >= priority:
+                self.dropped += 1
+                return False
+            del self._queued[lowest_url]
+            self.dropped += 1
+        self._queued[url] = priority
+        heapq.heappush(self._heap, (-priority, next(self._order), url))
+        self._ready_event().set()
+        return True
+
+    def _ready_event(self) -> asyncio.Event:
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
+
+    async def get(self) -> str:
+        """Wait for and remove the highest-priority URL"""
+        while True:
+            while self._heap:
+                negative_priority, _, url = heapq.heappop(self._heap)
+                if self._queued.get(url) == -negative_priority:
+                    del self._queued[url]
+                    return url
+            ready = self._ready_event()
+            ready.clear()
+            await ready.wait()
+
+
+class Prefetcher:
+    """Workers that process queued URLs only while interactive traffic leaves capacity spare"""
+
+    def __init__(self, process, has_capacity, concurrency=PREFETCH_CONCURRENCY):
+        self.queue = PrefetchQueue()
+        self.process = process
+        self.has_capacity = has_capacity
+        self.concurrency = concurrency
+        self._workers = []
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    async def _work(self):
+        while True:
+            url = await self.queue.get()
+            # Interactive requests come first: wait until they leave spare capacity
+            while not self.has_capacity():
+                self.deferred += 1
+                await asyncio.sleep(PREFETCH_POLL_SECONDS)
+            self.active += 1
+            try:
+                await self.process(url)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+            finally:
+                self.active -= 1
+
+    def stats(self):
+        return {
+            "queued": len(self.queue),
+            "max_queue": self.queue.max_size,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "dropped": self.queue.dropped,
+        }
@@ -0,0 +1,18 @@
+"""
+Minimal prompt templates
+
+Same interface as langchain's PromptTemplate for the way the app uses it
+(from_template, .template and .format), without importing langchain at startup.
+"""
+
+
+class PromptTemplate:
+    def __init__(self, template: str):
+        self.template = template
+
+    @classmethod
+    def from_template(cls, template: str) -> "PromptTemplate":
+        return cls(template)
+
+    def format(self, **kwargs) -> str:
+        return self.template.format(**kwargs)
@@ -0,0 +1,333 @@
+"""
+Request deadlines, hedged attempts and circuit breakers for upstream calls
+"""
+
+import os
+import math
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+
+# End-to-end budget for one request; clients may ask for less with X-Request-Timeout (seconds)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+# Consecutive failures that open a breaker, and how long it stays open before a trial call
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+# Timeouts count as failures only when the call had at least this long (a short client
+# budget says nothing about the upstream's health)
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", "10"))
+# A second attempt starts once the first has run longer than this latency percentile
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# Successful calls observed before hedging starts, and how many are kept
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+# At most this share of calls get a second attempt, which bounds the extra upstream load
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.05"))
+
+_deadline = ContextVar("request_deadline", default=None)
+# Length of the current request's budget, for work that restarts it (e.g. each page of a batch)
+_budget = ContextVar("request_budget", default=REQUEST_DEADLINE_SECONDS)
+
+
+class DeadlineExceeded(HTTPException):
+    """The request's time budget ran out; surfaces as 504"""
+
+    def __init__(self, stage: str, budget: float = 0.0):
+        self.stage = stage
+        # Seconds the call was given
+        self.budget = budget
+        super().__init__(status_code=504, detail=f"Request deadline exceeded while waiting for {stage}")
+
+
+class CircuitOpen(HTTPException):
+    """An upstream is failing and calls to it are skipped; surfaces as 503 with Retry-After"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is unavailable, please retry shortly",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+def remaining():
+    """Seconds left before the current request's deadline, or None without one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float = None):
+    """Give the enclosed work its own deadline (by default the length of the request's budget)"""
+    if seconds is None:
+        seconds = _budget.get()
+    token = _deadline.set(time.monotonic() + seconds if seconds > 0 else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def without_deadline() -> contextvars.Context:
+    """A copy of the current context with no deadline, for work shared by several requests"""
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+
+def _timeout(cap=None):
+    left = remaining()
+    if cap is not None:
+        left = cap if left is None else min(left, cap)
+    return left
+
+
+async def within(awaitable, stage: str, cap: float = None):
+    """Await with the time left before the deadline (and at most `cap` seconds)"""
+    timeout = _timeout(cap)
+    if timeout is not None and timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage, timeout) from None
+
+
+async def stream_within(pieces, stage: str, cap: float = None):
+    """Relay an async generator until the deadline (or `cap` seconds) runs out"""
+    timeout = _timeout(cap)
+    end = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            step = None if end is None else end - time.monotonic()
+            if step is not None and step <= 0:
+                raise DeadlineExceeded(stage)
+            try:
+                piece = await asyncio.wait_for(pieces.__anext__(), step)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(stage, timeout) from None
+            yield piece
+    finally:
+        await pieces.aclose()
+
+
+class DeadlineMiddleware:
+    """Starts each request's deadline, which fetch and LLM calls made for it inherit"""
+
+    def __init__(self, app, seconds=REQUEST_DEADLINE_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        seconds = self.seconds
+        for name, value in scope["headers"]:
+            if name == b"x-request-timeout":
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    seconds = min(seconds, requested)
+                break
+        token = _budget.set(seconds)
+        try:
+            with deadline(seconds):
+                await self.app(scope, receive, send)
+        finally:
+            _budget.reset(token)
+
+
+class LatencyTracker:
+    """Recent successful call durations"""
+
+    def __init__(self, window=HEDGE_WINDOW, min_samples=HEDGE_MIN_SAMPLES):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float):
+        """The p-th percentile, or None until enough calls were seen"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Hedger:
+    """Runs a call, starting one more attempt if the first is slower than usual
+
+    The first result wins and the other attempt is cancelled. Hedging is off
+    unless enabled, and only a bounded share of calls is ever hedged.
+    """
+
+    def __init__(self, enabled=False, percentile=HEDGE_PERCENTILE, max_ratio=HEDGE_MAX_RATIO):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    async def _timed(self, attempt):
+        start = time.monotonic()
+        result = await attempt()
+        self.latency.observe(time.monotonic() - start)
+        return result
+
+    async def run(self, attempt, allowed=None):
+        """Await attempt() (a coroutine function), hedging when allowed() says there is capacity"""
+        self.calls += 1
+        delay = self.latency.percentile(self.percentile) if self.enabled else None
+        if delay is None:
+            return await self._timed(attempt)
+
+        first = asyncio.ensure_future(self._timed(attempt))
+        attempts = [first]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done or self.hedged >= self.calls * self.max_ratio or (allowed is not None and not allowed()):
+                return await first
+            self.hedged += 1
+            attempts.append(asyncio.ensure_future(self._timed(attempt)))
+            pending = set(attempts)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        delay = self.latency.percentile(self.percentile)
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_s": round(delay, 3) if delay is not None else None,
+        }
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures, letting one trial call through after a cooldown"""
+
+    def __init__(self, name: str, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.opened = 0
+        self.rejected = 0
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go ahead"""
+        if self.state == "open":
+            waited = time.monotonic() - self.opened_at
+            if waited < self.cooldown:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self.cooldown - waited)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self.trial_running:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self.cooldown)
+            self.trial_running = True
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.trial_running = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.trial_running = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failures:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_timeout(self, error: DeadlineExceeded):
+        if error.budget >= BREAKER_SLOW_SECONDS:
+            self.record_failure()
+        else:
+            self.release()
+
+    def release(self):
+        """End a call that said nothing about the upstream's health"""
+        self.trial_running = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class BreakerRegistry:
+    """One breaker per upstream name (e.g. per host), created on first use
+
+    Beyond max_size, the least recently used closed breakers are dropped; open
+    and half-open ones are kept so failing upstreams stay fenced off.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN_SECONDS, max_size=1024):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.max_size = max_size
+        self._breakers = OrderedDict()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            self._forget_closed()
+            breaker = self._breakers[name] = CircuitBreaker(name, self.failures, self.cooldown)
+        else:
+            self._breakers.move_to_end(name)
+        return breaker
+
+    def _forget_closed(self):
+        # Makes room for one more breaker
+        excess = len(self._breakers) + 1 - self.max_size
+        if excess > 0:
+            closed = [name for name, breaker in self._breakers.items() if breaker.state == "closed"]
+            for name in closed[:excess]:
+                del self._breakers[name]
+
+    def stats(self):
+        return {
+            "upstreams": len(self._breakers),
+            "open": sorted(name for name, breaker in self._breakers.items() if breaker.state != "closed"),
+            "opened": sum(breaker.opened for breaker in self._breakers.values()),
+            "rejected": sum(breaker.rejected for breaker in self._breakers.values()),
+        }
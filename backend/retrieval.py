@@ -0,0 +1,75 @@
+"""
+In-memory BM25 index over page chunks for selecting QA context
+"""
+
+import os
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+QA_INDEX_CACHE_SIZE = int(os.getenv("QA_INDEX_CACHE_SIZE", "128"))
+
+
+class BM25Index:
+    """Okapi BM25 ranking over a fixed list of chunks"""
+
+    def __init__(self, chunks, tokenize, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.tokenize = tokenize
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(chunks)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def search(self, query: str, top_k: int) -> list:
+        """Return (chunk index, score) pairs for the best matching chunks"""
+        terms = [term for term in set(self.tokenize(query)) if term in self.idf]
+        scores = []
+        for i, tf in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append((i, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:top_k]
+
+
+class IndexCache:
+    """LRU of built indexes keyed by a hash of the page content"""
+
+    def __init__(self, max_entries=QA_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # get_or_build() runs on worker threads; indexes are built outside the lock
+        self._lock = threading.Lock()
+
+    def get_or_build(self, content: str, build):
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index
+            self.misses += 1
+        index = build(content)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def stats(self):
+        return {"entries": len(self._indexes), "hits": self.hits, "misses": self.misses}
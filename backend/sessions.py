@@ -0,0 +1,119 @@
+"""
+Server-side page sessions: state reused by follow-up calls about one page
+"""
+
+import os
+import sys
+import time
+import secrets
+from collections import OrderedDict
+
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(128 * 1024 * 1024)))
+
+
+class PageSession:
+    """Extracted text of one page plus everything derived from it so far"""
+
+    __slots__ = ("id", "url", "text", "keyword_stats", "qa_index", "summary", "last_used", "size")
+
+    def __init__(self, text, url=None):
+        self.id = secrets.token_urlsafe(16)
+        self.url = url
+        self.text = text
+        self.keyword_stats = None
+        self.qa_index = None
+        self.summary = None
+        self.last_used = time.monotonic()
+        self.size = 0
+
+    def estimate_size(self) -> int:
+        """Approximate memory held by the session"""
+        size = sys.getsizeof(self.text)
+        if self.qa_index is not None:
+            # Chunk copies of the text plus per-chunk term frequencies
+            size += 2 * sys.getsizeof(self.text)
+        if self.keyword_stats is not None:
+            size += 100 * len(self.keyword_stats.counts)
+        if self.summary is not None:
+            size += sys.getsizeof(self.summary)
+        return size
+
+
+class SessionStore:
+    """Sessions by ID with an idle timeout and a memory budget (least recently used go first)"""
+
+    def __init__(self, max_bytes=SESSION_MAX_BYTES, idle_seconds=SESSION_IDLE_SECONDS):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def create(self, text, url=None) -> PageSession:
+        session = PageSession(text, url)
+        self._sessions[session.id] = session
+        self.update(session)
+        return session
+
+    def get(self, session_id):
+        """Return a live session and mark it used, or None"""
+        session = self._sessions.get(session_id)
+        if session is not None and time.monotonic() - session.last_used > self.idle_seconds:
+            self._remove(session_id)
+            self.expired += 1
+            session = None
+        if session is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def update(self, session: PageSession):
+        """Re-account a session after state was added to it, evicting others if over budget"""
+        if session.id not in self._sessions:
+            return
+        size = session.estimate_size()
+        self._bytes += size - session.size
+        session.size = size
+        self._expire_idle()
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            if oldest == session.id:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _expire_idle(self):
+        # Ordered by last use, so idle sessions are at the front
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.idle_seconds:
+                break
+            self._remove(session_id)
+            self.expired += 1
+
+    def _remove(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,113 @@
+"""
+TF-IDF cosine similarity over hashed keyword vectors
+"""
+
+import os
+import math
+import zlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SIMILARITY_DIM = int(os.getenv("SIMILARITY_DIM", str(2 ** 18)))
+IDF_STATS_PATH = os.getenv("IDF_STATS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".idf_stats.npz"))
+IDF_SAVE_EVERY = int(os.getenv("IDF_SAVE_EVERY", "50"))
+IDF_SEEN_DOCS = 10000
+
+
+class HashedVector:
+    """Sparse vector: sorted bucket indices with log-scaled term frequencies"""
+
+    __slots__ = ("indices", "weights")
+
+    def __init__(self, indices, weights):
+        self.indices = indices
+        self.weights = weights
+
+
+class SimilarityEngine:
+    """Scores texts with cosine similarity of TF-IDF weighted hashed vectors"""
+
+    def __init__(self, dim=SIMILARITY_DIM, path=IDF_STATS_PATH):
+        self.dim = dim
+        self.path = path
+        self.doc_freq = np.zeros(dim, dtype=np.int32)
+        self.doc_count = 0
+        self._seen = OrderedDict()
+        self._unsaved = 0
+        # observe() may be called from several worker threads
+        self._lock = threading.Lock()
+        self.load()
+
+    def vectorize(self, counts) -> HashedVector:
+        """Hash keyword counts into buckets (1 + log tf weighting)"""
+        buckets = {}
+        for term, freq in counts.items():
+            bucket = zlib.crc32(term.encode("utf-8")) % self.dim
+            buckets[bucket] = buckets.get(bucket, 0) + freq
+        indices = np.fromiter(buckets.keys(), dtype=np.int64, count=len(buckets))
+        weights = np.fromiter(buckets.values(), dtype=np.float64, count=len(buckets))
+        order = np.argsort(indices)
+        return HashedVector(indices[order], 1.0 + np.log(weights[order]))
+
+    def observe(self, doc_key, vector: HashedVector):
+        """Count a page in the corpus document frequencies (once per content)"""
+        with self._lock:
+            if doc_key in self._seen:
+                self._seen.move_to_end(doc_key)
+                return
+            self._seen[doc_key] = True
+            if len(self._seen) > IDF_SEEN_DOCS:
+                self._seen.popitem(last=False)
+            self.doc_freq[vector.indices] += 1
+            self.doc_count += 1
+            self._unsaved += 1
+            if self._unsaved >= IDF_SAVE_EVERY:
+                self.save()
+
+    def similarity_matrix(self, vectors) -> np.ndarray:
+        """Pairwise cosine similarities of the given vectors in one matrix product"""
+        vocab = np.unique(np.concatenate([v.indices for v in vectors]))
+        idf = np.log((1.0 + self.doc_count) / (1.0 + self.doc_freq[vocab])) + 1.0
+        matrix = np.zeros((len(vectors), len(vocab)))
+        for row, vector in enumerate(vectors):
+            matrix[row, np.searchsorted(vocab, vector.indices)] = vector.weights
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1.0
+        matrix /= norms[:, None]
+        return matrix @ matrix.T
+
+    @staticmethod
+    def score(matrix, i, j) -> float:
+        """One entry of a similarity matrix, clamped to [0, 1]"""
+        value = float(matrix[i, j])
+        return 0.0 if math.isnan(value) else min(max(value, 0.0), 1.0)
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                if int(data["dim"]) == self.dim:
+                    self.doc_freq = data["doc_freq"].astype(np.int32)
+                    self.doc_count = int(data["doc_count"])
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def save(self):
+        """Persist the IDF statistics atomically"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez_compressed(tmp_path, dim=self.dim, doc_freq=self.doc_freq, doc_count=self.doc_count)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+        except OSError:
+            # Read-only filesystems (e.g. serverless) keep the stats in memory only
+            pass
+
+    def stats(self):
+        return {
+            "documents": self.doc_count,
+            "dim": self.dim,
+            "nonzero_buckets": int(np.count_nonzero(self.doc_freq)),
+        }
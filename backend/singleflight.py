@@ -0,0 +1,45 @@
+"""
+Coalescing of concurrent identical calls into one in-flight task
+"""
+
+import asyncio
+
+import resilience
+
+
+class SingleFlight:
+    """Callers using the same key await one shared task and its result or error"""
+
+    def __init__(self):
+        self._calls = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key, fn, *args):
+        task = self._calls.get(key)
+        if task is None:
+            # The shared work must not stop at the deadline of whichever request started it;
+            # each caller bounds its own wait (see resilience.within). Tasks copy the context
+            # current when they are created, so create it inside one with no deadline.
+            loop = asyncio.get_running_loop()
+            task = resilience.without_deadline().run(loop.create_task, fn(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.started += 1
+        else:
+            self.shared += 1
+        # A caller going away must not cancel the work other callers wait on
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the error as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        return {"started": self.started, "shared": self.shared, "in_flight": self.in_flight()}
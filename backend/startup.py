@@ -0,0 +1,86 @@
+"""
+Cold-start timing: phase timings recorded in-process and an import-time report
+
+    python startup.py                      # slowest imports of app.py
+    python startup.py --json startup.json  # machine-readable, for tracking regressions
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+# Imported first by app.py, so this approximates the start of the app import
+STARTED = time.perf_counter()
+
+timings = {}
+
+
+def mark(name: str):
+    """Record the time elapsed since startup began"""
+    timings[name] = time.perf_counter() - STARTED
+
+
+@contextmanager
+def record(name: str):
+    """Record how long a (lazy) initialization step took"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def report() -> dict:
+    return {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+
+
+def import_breakdown(module="app", top=25) -> dict:
+    """Run `python -X importtime` on a module and summarize the slowest imports"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    total = next((item["cumulative_ms"] for item in imports if item["module"] == module), 0.0)
+    slowest = sorted(imports, key=lambda item: item["cumulative_ms"], reverse=True)[:top]
+    return {"module": module, "total_ms": total, "slowest": slowest}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the API module")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    args = parser.parse_args()
+
+    breakdown = import_breakdown(args.module, args.top)
+    print(f"import {breakdown['module']}: {breakdown['total_ms']:.1f} ms")
+    for item in breakdown["slowest"]:
+        indent = "  " * item["depth"]
+        print(f"{item['cumulative_ms']:>10.1f} ms  {indent}{item['module']}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(breakdown, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Persistent cache store shared by worker processes (SQLite in WAL mode)
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import tempfile
+import threading
+
+PERSISTENT_STORE = os.getenv("PERSISTENT_STORE", "1") == "1"
+STORE_PATH = os.getenv("STORE_PATH", os.path.join(tempfile.gettempdir(), "interectors_cache.sqlite3"))
+STORE_MAX_BYTES = int(os.getenv("STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+# How many writes between size checks
+STORE_EVICT_EVERY = int(os.getenv("STORE_EVICT_EVERY", "50"))
+
+# Reads refresh the LRU timestamp at most this often, to keep reads cheap
+TOUCH_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+"""
+
+
+class PersistentStore:
+    """Compressed key/value entries with size-based LRU eviction"""
+
+    def __init__(self, path=STORE_PATH, max_bytes=STORE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._local = threading.local()
+        try:
+            self._connection().executescript(SCHEMA)
+        except sqlite3.Error:
+            # e.g. read-only filesystem: run without the persistent tier
+            self.enabled = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets processes read while one writes"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace: str, key: str):
+        """Return the stored text or None"""
+        if not self.enabled:
+            return None
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT value, accessed_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                connection.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+                )
+        except sqlite3.Error:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def set(self, namespace: str, key: str, value: str):
+        if not self.enabled:
+            return
+        data = zlib.compress(value.encode("utf-8"), 6)
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, data, len(data), time.time()),
+            )
+        except sqlite3.Error:
+            return
+        self._writes += 1
+        if self._writes % STORE_EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the store is under 90% of its cap"""
+        try:
+            connection = self._connection()
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            while total > self.max_bytes * 0.9:
+                rows = connection.execute(
+                    "SELECT namespace, key, size FROM entries ORDER BY accessed_at LIMIT 100"
+                ).fetchall()
+                if not rows:
+                    break
+                connection.executemany(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?", [(ns, key) for ns, key, _ in rows]
+                )
+                total -= sum(size for _, _, size in rows)
+                self.evictions += len(rows)
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        stats = {
+            "enabled": self.enabled,
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+        if self.enabled:
+            try:
+                count, total = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                stats.update({"entries": count, "bytes": total})
+            except sqlite3.Error:
+                pass
+        return stats
+
+
+class NullStore:
+    """Stand-in when the persistent store is disabled"""
+
+    enabled = False
+
+    def get(self, namespace, key):
+        return None
+
+    def set(self, namespace, key, value):
+        pass
+
+    def stats(self):
+        return {"enabled": False}
+
+
+_store = None
+
+
+def get_store():
+    """The process-wide store, opened on first use"""
+    global _store
+    if _store is None:
+        _store = PersistentStore() if PERSISTENT_STORE else NullStore()
+    return _store
+
+
+def counters():
+    """Hit/miss counts for metrics scrapes, without opening or querying the store"""
+    return {"hits": getattr(_store, "hits", 0), "misses": getattr(_store, "misses", 0)}
@@ -0,0 +1,35 @@
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from compact import compact
+
+def test_compact():
+    print("Testing prompt compaction...")
+
+    # Repeated paragraphs and footers are kept once, whitespace is normalized
+    text = "Sign up for our weekly newsletter to get the latest stories.\n" \
+           "The  article   body.\n\n" \
+           "Sign up for our weekly newsletter to get the latest stories.\n"
+    result = compact(text).text
+    print("Repeated paragraph:", repr(result))
+    assert result == "Sign up for our weekly newsletter to get the latest stories.\nThe article body."
+
+    # Table cells (one per line from the extractor) keep their repeats
+    table = "Plan\nSSO\nAudit log\nFree\nNo\nNo\nPro\nYes\nNo\nEnterprise\nYes\nYes"
+    result = compact(table).text
+    print("Table:", repr(result))
+    assert result == table
+
+    # So do repeated code lines
+    code = "if (a) {\n  return;\n}\nif (b) {\n  return;\n}"
+    result = compact(code).text
+    print("Code:", repr(result))
+    assert result == "if (a) {\nreturn;\n}\nif (b) {\nreturn;\n}"
+
+    print("\nAll compaction checks passed")
+
+if __name__ == "__main__":
+    test_compact()
@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extractor import html_to_text
+
+def test_extractor():
+    print("Testing main-content extraction...")
+    
+    # Boilerplate blocks are dropped, the article is kept
+    html = """
+    <body><nav>Home About</nav><div class="cookie-banner">We use cookies</div>
+    <main><p>Hello world, this is the article.</p></main>
+    <div id="site_footer">Copyright</div></body>
+    """
+    text = html_to_text(html)
+    print("Boilerplate page:", repr(text))
+    assert text == "Hello world, this is the article."
+    
+    # Theme state classes on the page wrappers must not drop the whole page
+    for classes in ("home page has-sidebar", "no-sidebar", "modal-open", "has-navbar-fixed-top"):
+        html = f'<html class="{classes}"><body class="{classes}"><div class="{classes}">' \
+               f'<main><p>Hello world, this is the article.</p></main></div></body></html>'
+        text = html_to_text(html)
+        print(f"Wrapper classes {classes!r}:", repr(text))
+        assert text == "Hello world, this is the article."
+    
+    # Pages wrapped in a form or in a wrapper whose classes match a boilerplate name are kept
+    article = "<h1>Quarterly results</h1><p>Revenue grew by ten percent over the last quarter.</p>"
+    for wrapper in ('<form id="aspnetForm" method="post" action="./page.aspx">%s</form>',
+                    '<div class="site-content with-sidebar">%s</div>',
+                    '<div class="post share-enabled">%s</div>'):
+        html = "<html><body>" + wrapper % article + "</body></html>"
+        text = html_to_text(html)
+        print(f"Wrapper {wrapper.split('>')[0] + '>'}:", repr(text))
+        assert text == "Quarterly results\nRevenue grew by ten percent over the last quarter."
+    
+    # Hidden text stays out even when everything else is a fallback
+    html = '<div class="sidebar"><p>Visible words</p><script>var x = 1;</script>' \
+           '<p style="display:none">Hidden words</p></div>'
+    text = html_to_text(html)
+    print("Fallback without hidden text:", repr(text))
+    assert text == "Visible words"
+    
+    print("\nAll extraction checks passed")
+
+if __name__ == "__main__":
+    test_extractor()
@@ -0,0 +1,109 @@
+import sys
+import os
+import time
+import asyncio
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, Hedger, LatencyTracker
+from singleflight import SingleFlight
+
+def test_breaker():
+    print("Testing circuit breaker transitions...")
+    breaker = CircuitBreaker("upstream", failures=2, cooldown=0.1)
+
+    # Closed: calls go ahead until enough consecutive failures
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.check()
+    breaker.record_failure()
+    print("After 2 failures:", breaker.state)
+    assert breaker.state == "open"
+
+    # Open: calls fail fast until the cooldown is over
+    try:
+        breaker.check()
+        assert False, "an open breaker must reject calls"
+    except CircuitOpen as e:
+        print("Rejected with status", e.status_code, "Retry-After", e.headers["Retry-After"])
+        assert e.status_code == 503
+
+    # Half-open: one trial call, others are still rejected
+    time.sleep(0.15)
+    breaker.check()
+    print("After cooldown:", breaker.state)
+    assert breaker.state == "half_open"
+    try:
+        breaker.check()
+        assert False, "only one trial call may run"
+    except CircuitOpen:
+        pass
+
+    # A failed trial opens it again, a successful one closes it
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.15)
+    breaker.check()
+    breaker.record_success()
+    print("After a successful trial:", breaker.state)
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+    assert breaker.opened == 2
+
+async def run_hedged():
+    hedger = Hedger(enabled=True, max_ratio=0.1)
+    # A long history of fast calls, so the slow calls below stay over the p95
+    hedger.latency = LatencyTracker(window=1000)
+    for _ in range(1000):
+        hedger.latency.observe(0.001)
+
+    async def slow_attempt():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    # Every call is slower than the recent p95, but only 10% may be hedged
+    for _ in range(30):
+        assert await hedger.run(slow_attempt) == "ok"
+    return hedger
+
+def test_hedge_ratio():
+    print("\nTesting the hedge ratio cap...")
+    hedger = asyncio.run(run_hedged())
+    print("Hedging stats:", hedger.stats())
+    assert hedger.hedged == 3
+
+async def run_shared_flight():
+    flight = SingleFlight()
+    seen = {}
+
+    async def work():
+        # The shared task does not inherit the deadline of the caller that started it
+        seen["deadline"] = resilience.remaining()
+        await asyncio.sleep(0.3)
+        return "done"
+
+    async def caller(seconds):
+        with resilience.deadline(seconds):
+            return await resilience.within(flight.do("page", work), "work")
+
+    impatient, patient = await asyncio.gather(caller(0.1), caller(2), return_exceptions=True)
+    return flight, seen, impatient, patient
+
+def test_shared_flight_deadlines():
+    print("\nTesting per-caller deadlines on a shared flight...")
+    flight, seen, impatient, patient = asyncio.run(run_shared_flight())
+    print("Short deadline:", repr(impatient))
+    print("Long deadline:", repr(patient))
+    print("Flight stats:", flight.stats())
+    assert isinstance(impatient, DeadlineExceeded)
+    assert patient == "done"
+    assert seen["deadline"] is None
+    assert flight.stats() == {"started": 1, "shared": 1, "in_flight": 0}
+
+if __name__ == "__main__":
+    test_breaker()
+    test_hedge_ratio()
+    test_shared_flight_deadlines()
+    print("\nAll resilience checks passed")
@@ -0,0 +1,39 @@
+import sys
+import os
+import random
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from text_chunks import split_content_defined
+
+def test_content_defined_chunks():
+    print("Testing content-defined chunking...")
+    random.seed(7)
+    words = "page text with some words about cats dogs birds trees rivers and mountains".split()
+    lines = [" ".join(random.choice(words) for _ in range(random.randint(5, 20))) for _ in range(2000)]
+    text = "\n".join(lines)
+
+    chunks = split_content_defined(text, 400)
+    print(f"{len(chunks)} chunks")
+    assert "\n".join(chunks) == text
+    assert len(chunks) > 10
+
+    # An edit in the middle changes the chunks around it and no others
+    lines[1000] = "an edited line that was not on the page before"
+    edited = split_content_defined("\n".join(lines), 400)
+    changed = set(edited) - set(chunks)
+    print(f"Chunks changed by one edit: {len(changed)}")
+    assert 1 <= len(changed) <= 2
+    assert any(lines[1000] in chunk for chunk in changed)
+    assert edited[:3] == chunks[:3] and edited[-3:] == chunks[-3:]
+
+    # Inserting a line at the top leaves the chunks further down as they were
+    inserted = split_content_defined("a new first line\n" + text, 400)
+    print(f"Chunks kept after an insertion at the top: {len(set(inserted) & set(chunks))} of {len(chunks)}")
+    assert len(set(chunks) - set(inserted)) <= 2
+
+    print("\nAll chunking checks passed")
+
+if __name__ == "__main__":
+    test_content_defined_chunks()
@@ -0,0 +1,88 @@
+"""
+Token estimation and splitting of page text into prompt-sized chunks
+"""
+
+import re
+import zlib
+
+# Rough average for English text with Gemini/GPT style tokenizers
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting prompts"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_into_chunks(text: str, max_tokens: int) -> list:
+    """Split text on paragraph and line boundaries into chunks under max_tokens"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_len = 0
+    for block in _blocks(text, max_chars):
+        if current and current_len + len(block) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current = []
+            current_len = 0
+        current.append(block)
+        current_len += len(block) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def split_content_defined(text: str, target_tokens: int) -> list:
+    """Split text into chunks of about target_tokens at content-defined line boundaries
+
+    Whether a chunk ends after a line depends only on that line, so an edit
+    moves the boundaries around it but leaves chunks elsewhere unchanged, and
+    their hashes (and anything cached under them) still match on the next visit.
+    """
+    target_chars = target_tokens * CHARS_PER_TOKEN
+    min_chars = target_chars // 4
+    max_chars = target_chars * 2
+    chunks = []
+    current = []
+    current_len = 0
+    for line in _lines(text, max_chars):
+        if current and current_len + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current = []
+            current_len = 0
+        current.append(line)
+        current_len += len(line) + 1
+        # Cut with probability proportional to the line's length, so chunks average target_chars
+        if current_len >= min_chars and zlib.crc32(line.encode("utf-8")) < (len(line) + 1) / target_chars * 2 ** 32:
+            chunks.append("\n".join(current))
+            current = []
+            current_len = 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _lines(text, max_chars):
+    """Yield non-empty stripped lines no longer than max_chars"""
+    for line in text.splitlines():
+        line = line.strip()
+        for start in range(0, len(line), max_chars):
+            yield line[start:start + max_chars]
+
+
+def _blocks(text, max_chars):
+    """Yield non-empty blocks no longer than max_chars"""
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for line in paragraph.splitlines():
+            line = line.strip()
+            # Hard-split lines that are still too long (e.g. minified text)
+            for start in range(0, len(line), max_chars):
+                yield line[start:start + max_chars]
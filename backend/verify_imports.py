@@ -9,7 +9,7 @@ try:
     from pydantic import BaseModel
     from langchain_google_genai import ChatGoogleGenerativeAI
     from langchain_community.document_loaders import WebBaseLoader
-    from langchain.prompts import PromptTemplate
+    from prompts import PromptTemplate
     import asyncio
     import uvicorn
     print("✅ All imports successful")
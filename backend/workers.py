@@ -0,0 +1,144 @@
+"""
+Worker pools for CPU-bound stages (HTML parsing, keyword counting, features)
+
+Small inputs run inline on the event loop, where the hand-off would cost more
+than it saves. Larger ones go to a thread pool, and the largest go to worker
+processes when the function is safe to run there, so they do not hold the GIL.
+"""
+
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import startup
+
+# inline: never offload; thread: threads only; process: processes where allowed; auto: by input size
+WORKER_MODE = os.getenv("WORKER_MODE", "auto")
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", str(min(8, (os.cpu_count() or 1) + 2))))
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Inputs below this many characters run on the event loop
+WORKER_INLINE_CHARS = int(os.getenv("WORKER_INLINE_CHARS", "20000"))
+# In auto mode, inputs of at least this many characters go to a process
+WORKER_PROCESS_CHARS = int(os.getenv("WORKER_PROCESS_CHARS", "100000"))
+# Offloaded jobs queued or running at once; further callers wait for a slot
+WORKER_QUEUE_DEPTH = int(os.getenv("WORKER_QUEUE_DEPTH", "64"))
+
+_threads = None
+_processes = None
+_processes_ready = None
+_slots = None
+
+counts = {"inline": 0, "thread": 0, "process": 0}
+waiting = 0
+running = 0
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    global _threads
+    if _threads is None:
+        _threads = ThreadPoolExecutor(WORKER_THREADS, thread_name_prefix="cpu-worker")
+    return _threads
+
+
+def _start_process_pool() -> ProcessPoolExecutor:
+    """Create the process pool and wait until its workers are up"""
+    with startup.record("process_pool"):
+        # Forking a process that runs threads is unsafe; a fork server starts clean
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        pool = ProcessPoolExecutor(WORKER_PROCESSES, mp_context=context)
+        for future in [pool.submit(int) for _ in range(WORKER_PROCESSES)]:
+            future.result()
+    return pool
+
+
+async def _process_pool() -> ProcessPoolExecutor:
+    """The process pool, started on a thread on first use so the event loop is not blocked"""
+    global _processes, _processes_ready
+    if _processes is None:
+        if _processes_ready is None:
+            _processes_ready = asyncio.get_running_loop().run_in_executor(_thread_pool(), _start_process_pool)
+        # Waiters going away must not cancel the start-up others wait on
+        _processes = await asyncio.shield(_processes_ready)
+    return _processes
+
+
+def _queue() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(WORKER_QUEUE_DEPTH)
+    return _slots
+
+
+def placement(size: int, process_safe: bool = False) -> str:
+    """Where a job on an input of `size` characters runs: inline, thread or process"""
+    if WORKER_MODE == "inline" or size < WORKER_INLINE_CHARS:
+        return "inline"
+    if process_safe and WORKER_PROCESSES > 0:
+        if WORKER_MODE == "process" or (WORKER_MODE == "auto" and size >= WORKER_PROCESS_CHARS):
+            return "process"
+    return "thread"
+
+
+async def run(func, *args, size: int = 0, process_safe: bool = False):
+    """Run func(*args) inline, on a thread or in a worker process
+
+    process_safe marks picklable module-level functions that do not depend on
+    this process's state (caches, shared engines).
+    """
+    global waiting, running
+    where = placement(size, process_safe)
+    counts[where] += 1
+    if where == "inline":
+        return func(*args)
+
+    loop = asyncio.get_running_loop()
+    waiting += 1
+    try:
+        await _queue().acquire()
+    finally:
+        waiting -= 1
+    running += 1
+    try:
+        if where == "process":
+            try:
+                return await loop.run_in_executor(await _process_pool(), func, *args)
+            except (BrokenProcessPool, OSError):
+                # Workers failed to start or died (e.g. killed for memory): run this job
+                # on a thread and start a new pool next time
+                _reset_process_pool()
+        return await loop.run_in_executor(_thread_pool(), func, *args)
+    finally:
+        running -= 1
+        _queue().release()
+
+
+def _reset_process_pool():
+    global _processes, _processes_ready
+    if _processes is not None:
+        _processes.shutdown(wait=False, cancel_futures=True)
+    _processes = None
+    _processes_ready = None
+
+
+def stats():
+    return {
+        "mode": WORKER_MODE,
+        "threads": WORKER_THREADS,
+        "processes": WORKER_PROCESSES,
+        "queue_depth": WORKER_QUEUE_DEPTH,
+        "waiting": waiting,
+        "running": running,
+        "jobs": dict(counts),
+    }
+
+
+def shutdown():
+    """Stop the pools (called on application shutdown)"""
+    global _threads
+    _reset_process_pool()
+    if _threads is not None:
+        _threads.shutdown(wait=False)
+        _threads = None
@@ -15,20 +15,63 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
       .then(result => sendResponse({ success: true, data: result }))
       .catch(error => sendResponse({ success: false, error: error.message }));
     return true; // Keep the message channel open for async response
+  } else if (request.action === "summarizeTabs") {
+    summarizeOpenTabs()
+      .then(result => sendResponse({ success: true, data: result }))
+      .catch(error => sendResponse({ success: false, error: error.message }));
+    return true; // Keep the message channel open for async response
   }
   // Removed extractSemanticKeywords handling
 });
 
+// Read the rendered text of the active tab so the server can skip fetching it
+async function getPageText() {
+  try {
+    const [tab] = await chrome.tabs.query({active: true, currentWindow: true});
+    const [result] = await chrome.scripting.executeScript({
+      target: {tabId: tab.id},
+      func: () => document.body ? document.body.innerText : ""
+    });
+    return result && result.result ? result.result : null;
+  } catch (error) {
+    // e.g. chrome:// pages; the server falls back to fetching the URL
+    console.warn("Could not read page text:", error);
+    return null;
+  }
+}
+
+// POST options for a JSON body; larger bodies (page text) are sent gzip-compressed
+async function jsonRequest(body) {
+  const json = JSON.stringify(body);
+  if (json.length < 1024) {
+    return {method: "POST", headers: {"Content-Type": "application/json"}, body: json};
+  }
+  const stream = new Blob([json]).stream().pipeThrough(new CompressionStream("gzip"));
+  return {
+    method: "POST",
+    headers: {"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    body: await new Response(stream).arrayBuffer()
+  };
+}
+
+// Request body with the page URL and, when available, its text
+async function buildPageBody(url) {
+  const body = {url: url};
+  const text = await getPageText();
+  if (text) {
+    body.content = text;
+  }
+  return body;
+}
+
+// Session IDs returned by /summarize, by page URL; follow-up questions send
+// the ID instead of the page so the server can reuse its state
+const pageSessions = new Map();
+
 // Function to summarize the current page
 async function summarizePage(url) {
   try {
-    const response = await fetch(`${API_SERVER_URL}/summarize`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({url: url})
-    });
+    const response = await fetch(`${API_SERVER_URL}/summarize`, await jsonRequest(await buildPageBody(url)));
     
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
@@ -36,6 +79,9 @@ async function summarizePage(url) {
     }
     
     const data = await response.json();
+    if (data.session_id) {
+      pageSessions.set(url, data.session_id);
+    }
     return data;
   } catch (error) {
     console.error("Summarize API Error:", error);
@@ -43,19 +89,76 @@ async function summarizePage(url) {
   }
 }
 
+// Summarize every web page open in the current window with one request;
+// the server streams each summary (as Server-Sent Events) as soon as it is ready
+async function summarizeOpenTabs() {
+  const tabs = await chrome.tabs.query({currentWindow: true});
+  const urls = tabs.map(tab => tab.url).filter(url => url && /^https?:/.test(url));
+  if (!urls.length) {
+    return {results: [], errors: []};
+  }
+  
+  try {
+    const response = await fetch(`${API_SERVER_URL}/summarize/batch`, await jsonRequest({urls: urls}));
+    
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `API error: ${response.status} ${response.statusText}`);
+    }
+    
+    const results = [];
+    const errors = [];
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    while (true) {
+      const {value, done} = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += value;
+      let end;
+      while ((end = buffer.indexOf("\n\n")) !== -1) {
+        const message = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const event = (message.match(/^event: (.*)$/m) || [])[1];
+        const data = (message.match(/^data: (.*)$/m) || [])[1];
+        if (event === "result") {
+          const result = JSON.parse(data);
+          pageSessions.set(result.url, result.session_id);
+          results.push(result);
+        } else if (event === "error") {
+          errors.push(JSON.parse(data));
+        }
+      }
+    }
+    return {results: results, errors: errors};
+  } catch (error) {
+    console.error("Batch Summarize API Error:", error);
+    throw error;
+  }
+}
+
 // Function to ask questions about the current page
 async function askQuestion(url, question) {
   try {
-    const response = await fetch(`${API_SERVER_URL}/qa`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        url: url,
-        question: question
-      })
-    });
+    const postQuestion = async (page) => fetch(`${API_SERVER_URL}/qa`, await jsonRequest({
+      ...page,
+      question: question
+    }));
+    
+    let response;
+    const sessionId = pageSessions.get(url);
+    if (sessionId) {
+      response = await postQuestion({session_id: sessionId});
+      if (response.status === 404) {
+        // The session expired on the server: send the page again
+        pageSessions.delete(url);
+        response = null;
+      }
+    }
+    if (!response) {
+      response = await postQuestion(await buildPageBody(url));
+    }
     
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
@@ -196,6 +196,60 @@ async function summarizePage() {
   }
 }
 
+// Function to summarize every web page open in the current window
+async function summarizeAllTabs() {
+  const summarizeTabsBtn = document.getElementById("summarizeTabsBtn");
+  try {
+    summarizeTabsBtn.disabled = true;
+    summarizeTabsBtn.innerHTML = 'Generating...';
+    
+    showLoading('summary');
+    
+    // Send message to background script
+    const response = await chrome.runtime.sendMessage({
+      action: "summarizeTabs"
+    });
+    
+    if (!response.success) {
+      throw new Error(response.error);
+    }
+    
+    const summary = document.getElementById("summary");
+    summary.innerHTML = '';
+    const {results, errors} = response.data;
+    if (!results.length && !errors.length) {
+      summary.innerHTML = '<div class="empty-state">No web pages are open in this window</div>';
+      return;
+    }
+    
+    results.forEach(result => {
+      const tabDiv = document.createElement('div');
+      tabDiv.className = 'tab-summary';
+      const title = document.createElement('div');
+      title.className = 'tab-summary-title';
+      title.textContent = result.url;
+      tabDiv.appendChild(title);
+      const content = document.createElement('div');
+      content.className = 'summary-content';
+      content.innerHTML = convertMarkdownToHtml(result.summary);
+      tabDiv.appendChild(content);
+      summary.appendChild(tabDiv);
+    });
+    
+    errors.forEach(error => {
+      const errorDiv = document.createElement('div');
+      errorDiv.className = 'error';
+      errorDiv.textContent = `${error.url}: ${error.detail}`;
+      summary.appendChild(errorDiv);
+    });
+  } catch (error) {
+    handleApiError('summary', error);
+  } finally {
+    summarizeTabsBtn.disabled = false;
+    summarizeTabsBtn.innerHTML = 'Summarize All Tabs';
+  }
+}
+
 // Function to ask questions about the current page
 async function askQuestion() {
   try {
@@ -271,6 +325,7 @@ async function askQuestion() {
 // Event listeners
 document.addEventListener('DOMContentLoaded', function() {
   document.getElementById("summarizeBtn").addEventListener("click", summarizePage);
+  document.getElementById("summarizeTabsBtn").addEventListener("click", summarizeAllTabs);
   document.getElementById("qa-btn").addEventListener("click", askQuestion);
   // Removed semanticKeywordsBtn event listener
   